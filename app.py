@@ -2,135 +2,102 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
-import re
+import io
+import hashlib
+
+import columnar
+import compare
+import cross_index
+import cube
+import dates_fr
+import directors
+import ingest
+import perf
+import periods
+import ranking
+import report
+import sources
+import trends
 
 st.set_page_config(page_title="Analyse Packshot", layout="wide")
 st.title("📺 Analyse des campagnes publicitaires TV")
 
 DATA_DIR = "fichier-clean"
+REFRESH_SECONDS = 30  # intervalle de vérification de version.json (nouvelle fusion publiée)
 
 # -------------------- Helpers --------------------
-@st.cache_data(show_spinner=False)
-def load_clean_default():
-    films_path = os.path.join(DATA_DIR, "films.csv")
-    campagnes_path = os.path.join(DATA_DIR, "campagnes.csv")
-    if os.path.exists(campagnes_path):
-        return pd.read_csv(campagnes_path), "campagnes.csv"
-    if os.path.exists(films_path):
-        return pd.read_csv(films_path), "films.csv"
-    return None, None
-
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df.columns = [c.strip() for c in df.columns]
-    if "href" not in df.columns and "Film-href" in df.columns:
-        df = df.rename(columns={"Film-href": "href"})
-    return df
-
-def ensure_date(df: pd.DataFrame) -> pd.DataFrame:
-    if "Date de sortie" not in df.columns:
-        raise ValueError("Colonne 'Date de sortie' manquante.")
-    out = pd.to_datetime(df["Date de sortie"], errors="coerce", dayfirst=True, infer_datetime_format=True)
-    if out.isna().mean() > 0.5:
-        months = {
-            "janvier":"january","février":"february","fevrier":"february","mars":"march","avril":"april","mai":"may",
-            "juin":"june","juillet":"july","août":"august","aout":"august","septembre":"september","octobre":"october",
-            "novembre":"november","décembre":"december","decembre":"december"
-        }
-        s = df["Date de sortie"].astype(str).str.lower()
-        for fr,en in months.items():
-            s = s.str.replace(fr, en, regex=False)
-        out = pd.to_datetime(s, errors="coerce", dayfirst=True, infer_datetime_format=True)
-    df = df.copy()
-    df["Date de sortie"] = out
-    df = df.dropna(subset=["Date de sortie"])
-    return df
-
-def normalize_text_cols(df: pd.DataFrame, cols):
-    out = df.copy()
-    for c in cols:
-        if c in out.columns:
-            out[c] = out[c].astype(str).str.strip()
-            out[c] = out[c].replace({"": "Inconnu", "nan": "Inconnu", "None": "Inconnu"})
-    return out
-
-# split robust pour réalisateurs multiples
-SPLIT_RE = re.compile(r"\s*(?:,|/|&| x |\+| et )\s*", flags=re.IGNORECASE)
-
-def first_non_null(series: pd.Series):
-    for v in series:
-        if pd.notna(v) and str(v).strip() != "":
-            return v
-    return "Inconnu"
-
-def aggregate_campaigns_from_films(df_films: pd.DataFrame) -> pd.DataFrame:
-    # construit une vue Campagnes à partir d’un tableau films
-    df = df_films.copy()
-    for col in ["Client","Agence","Production","Réalisateur"]:
-        if col not in df.columns:
-            df[col] = "Inconnu"
-
-    # Exploser réalisateurs pour récupérer l’union par href, mais garder un champ concat
-    df["_Reals_list"] = (
-        df["Réalisateur"].fillna("Inconnu").astype(str).apply(lambda s: [r for r in SPLIT_RE.split(s) if r] )
-    )
-
-    agg = df.sort_values("Date de sortie").groupby("href").agg({
-        "Date de sortie": "min",  # première diffusion de la campagne
-        "Client": first_non_null,
-        "Agence": first_non_null,
-        "Production": first_non_null,
-        "_Reals_list": lambda lists: sorted(set(sum(lists, [])))  # union unique
-    }).reset_index()
-
-    # pour affichage lisible
-    agg["Réalisateur"] = agg["_Reals_list"].apply(lambda lst: " & ".join(lst) if lst else "Inconnu")
-    return agg.drop(columns=["_Reals_list"])
-
-def detect_granularity(df: pd.DataFrame) -> str:
-    # si href unique => dataset campagnes, sinon films
-    if "href" in df.columns and df["href"].nunique(dropna=True) == len(df):
-        return "campagnes"
-    return "films"
-
-def build_views(df_raw: pd.DataFrame):
-    # normaliser colonnes + date + textes
-    base_df = normalize_columns(df_raw)
-    needed = ["href","Client","Agence","Production","Réalisateur","Date de sortie"]
-    for col in needed:
-        if col not in base_df.columns:
-            if col == "href":
-                raise ValueError("Colonne clé 'href' (ou 'Film-href') manquante.")
-            base_df[col] = "Inconnu"
-    base_df = ensure_date(base_df)
-    base_df = normalize_text_cols(base_df, ["Client","Agence","Production","Réalisateur"])
-
-    detected = detect_granularity(base_df)
-    if detected == "campagnes":
-        campagnes = base_df.copy()
-        films = None
-    else:
-        films = base_df.copy()
-        campagnes = aggregate_campaigns_from_films(base_df)
-
-    return campagnes, films, detected, base_df
-
-def top_df(df: pd.DataFrame, label_col: str, n: int) -> pd.DataFrame:
-    s = df[label_col].value_counts().reset_index()
-    s.columns = [label_col, "Nombre"]
-    s.insert(0, "Rang", range(1, len(s) + 1))
-    return s.head(n)
-
-def top_director_by_campaigns(campagnes_df: pd.DataFrame, n: int) -> pd.DataFrame:
-    # exploser les réalisateurs multiples pour compter 1 campagne par réal
-    tmp = campagnes_df.copy()
-    reals_lists = tmp["Réalisateur"].fillna("Inconnu").astype(str).apply(lambda s: [r for r in SPLIT_RE.split(s) if r])
-    exploded = tmp.loc[reals_lists.index.repeat(reals_lists.str.len())].copy()
-    exploded["Réalisateur"] = [r for lst in reals_lists for r in lst]
-    counts = exploded.drop_duplicates(["href","Réalisateur"])["Réalisateur"].value_counts().reset_index()
-    counts.columns = ["Réalisateur","Nombre"]
-    counts.insert(0, "Rang", range(1, len(counts) + 1))
-    return counts.head(n)
+# Toute la préparation (lecture, dates, textes, agrégation campagnes, cube, index) est mise en cache
+# sur l'empreinte du contenu source : curseurs et listes déroulantes ne refont jamais ce travail.
+# Les caches sont bornés (max_entries) et la clé change dès que traitement.py réécrit fichier-clean/.
+def file_signature(path: str):
+    return sources.file_signature(path)
+
+def data_dir_signature():
+    return sources.data_dir_signature(DATA_DIR)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def file_digest(path: str, mtime_ns: int, size: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_clean_default(signature, data_version: int):
+    return sources.load_clean(DATA_DIR)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_columnar_default(columnar_signature, signature, data_version: int):
+    # vue campagnes typée écrite par traitement.py : utilisée si plus récente que toutes les sources
+    if not sources.is_fresh(columnar_signature, *signature):
+        return None
+    return columnar.read_columnar(columnar_signature[0])
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def read_upload(digest: str, name: str, _data: bytes) -> pd.DataFrame:
+    if name.lower().endswith(".csv"):
+        return pd.read_csv(io.BytesIO(_data))
+    return pd.read_excel(io.BytesIO(_data))
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def prepare_views(digest: str, _df_raw: pd.DataFrame) -> dict:
+    # objets partagés entre les reruns (pas de copie) : à traiter en lecture seule.
+    return sources.sorted_views(_df_raw, dates_fr.dates_cache_path(DATA_DIR))
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_cube_default(cube_signature, source_signature, data_version: int):
+    # cube écrit par traitement.py, utilisé seulement s'il est au moins aussi récent que la source ;
+    # renvoyé indexé (sommes cumulées par mois)
+    if source_signature is None or not sources.is_fresh(cube_signature, source_signature):
+        return None
+    cube_df = cube.read_cube(cube_signature[0])
+    return cube.index_cube(cube_df) if cube_df is not None else None
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_bridge_default(bridge_signature, source_signature, data_version: int):
+    # table pont href × Réalisateur écrite par traitement.py, même règle de fraîcheur que le cube
+    if source_signature is None or not sources.is_fresh(bridge_signature, source_signature):
+        return None
+    return directors.read_bridge(bridge_signature[0])
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def build_bridge_cached(digest: str, _campagnes: pd.DataFrame):
+    return directors.build_bridge(_campagnes)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def build_cube_cached(digest: str, _work: dict, _bridge: pd.DataFrame):
+    return cube.index_cube(cube.cube_from_views(_work, _bridge))
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def cross_index_cached(digest: str, gran_key: str, _df_work: pd.DataFrame, _bridge: pd.DataFrame | None):
+    # _df_work n'est pas haché : digest identifie le jeu de données
+    return cross_index.build_cross_index(_df_work, gran_key, _bridge)
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def month_matrix_cached(digest: str, dim: str, gran_key: str, _cube_idx: dict):
+    # matrice valeurs × mois d'une dimension : fenêtres et croissances sans recalcul par période
+    return trends.month_matrix(_cube_idx, dim, gran_key)
 
 # -------------------- Sidebar --------------------
 st.sidebar.header("Paramètres")
@@ -138,243 +105,326 @@ mode_src = st.sidebar.radio("Source des données", ["Par défaut (fichier-clean)
 granularity = st.sidebar.radio("Unité de comptage", ["Campagnes (href unique)", "Films"], index=0)
 top_n = st.sidebar.selectbox("Taille du TOP", [5, 10, 20, 50], index=1)
 
+# Mesures par section (optionnel : PACKSHOT_PERF=1, ou ?perf=1 pour cette session seulement ; ?perf=mem ajoute
+# le pic mémoire, ?perf=0 arrête), panneau « Performance » en fin de page. État propre à chaque session.
+perf.use_session_state(lambda: st.session_state.get("_perf"))
+if "_perf" not in st.session_state:
+    st.session_state["_perf"] = perf.session_state("app")
+perf_param = st.query_params.get("perf")
+if perf_param in ("0", "1", "mem"):
+    perf.enable(perf_param != "0", memory=perf_param == "mem")
+perf.begin("app")
+
+def stop_run():
+    # fin de rerun anticipée : run de mesure clos (tracemalloc libéré) avant st.stop()
+    perf.end()
+    st.stop()
+
 # -------------------- Chargement --------------------
+# version.json (incrémenté par traitement.py / ingest.py en fin de fusion, sous verrou) fait partie
+# de la clé des chargements par défaut : une nouvelle fusion invalide les caches sans intervention
+data_version = ingest.read_version(DATA_DIR)
 df_raw = None
+views = None
 source_label = ""
+digest = None
+source_signature = None
 
 if mode_src == "Par défaut (fichier-clean)":
-    df_raw, source_label = load_clean_default()
-    if df_raw is None:
-        st.warning("Aucun fichier trouvé dans 'fichier-clean/'. Uploade un fichier clean ou lance le traitement.")
+    # copie colonnaire (colonnes utiles seulement, déjà normalisées) si à jour, sinon source complète
+    columnar_signature = file_signature(columnar.columnar_path(DATA_DIR))
+    df_col = load_columnar_default(columnar_signature, data_dir_signature(), data_version)
+    if df_col is not None:
+        source_label, source_signature = columnar.COLUMNAR_NAME, columnar_signature
+        digest = file_digest(*source_signature)
+        views = sources.columnar_views(df_col)
+    else:
+        df_raw, source_label = load_clean_default(data_dir_signature(), data_version)
+        if source_label:
+            source_signature = file_signature(os.path.join(DATA_DIR, source_label))
+            digest = file_digest(*source_signature)
+        if df_raw is None:
+            st.warning("Aucun fichier trouvé dans 'fichier-clean/'. Uploade un fichier clean ou lance le traitement.")
 else:
     up = st.file_uploader("Uploader un fichier déjà clean (.csv ou .xlsx)", type=["csv","xlsx"])
     if up is not None:
         try:
-            if up.name.lower().endswith(".csv"):
-                df_raw = pd.read_csv(up)
-            else:
-                df_raw = pd.read_excel(up)
+            data = up.getvalue()
+            digest = hashlib.sha256(data).hexdigest()
+            df_raw = read_upload(digest, up.name, data)
             source_label = up.name
         except Exception as e:
             st.error(f"Erreur de lecture : {e}")
 
-if df_raw is None:
-    st.stop()
+if df_raw is None and views is None:
+    stop_run()
 
-try:
-    campagnes_view, films_view, detected, base_df = build_views(df_raw)
-except Exception as e:
-    st.error(f"Erreur de préparation des données : {e}")
-    st.stop()
+if views is None:
+    try:
+        views = prepare_views(digest, df_raw)
+    except Exception as e:
+        st.error(f"Erreur de préparation des données : {e}")
+        stop_run()
+campagnes_view, films_view, detected, base_df = views["campagnes"], views["films"], views["detected"], views["base_df"]
 
-# choisir la table de travail en fonction de la granularité souhaitée
+# choisir la table de travail en fonction de la granularité souhaitée (vues en cache : pas de copie)
 if granularity.startswith("Campagnes"):
-    df_work = campagnes_view.copy()
+    df_work = campagnes_view
 else:
-    df_work = films_view if films_view is not None else campagnes_view.copy()
+    df_work = films_view if films_view is not None else campagnes_view
 
-st.caption(f"Source: {source_label} — jeu détecté: {detected} — granularité utilisée: {'campagnes' if granularity.startswith('Campagnes') else 'films'} — {len(df_work)} lignes")
+gran_key = "campagnes" if granularity.startswith("Campagnes") else "films"
+st.caption(f"Source: {source_label} — jeu détecté: {detected} — granularité utilisée: {gran_key} — {len(df_work)} lignes")
 
 required = ["Agence","Client","Production","Réalisateur","Date de sortie","href"]
 missing = [c for c in required if c not in df_work.columns]
 if missing:
     st.error(f"Colonnes manquantes: {', '.join(missing)}")
-    st.stop()
+    stop_run()
 
 if df_work.empty:
     st.error("Aucune ligne exploitable après normalisation.")
-    st.stop()
+    stop_run()
+
+perf.lap("chargement", rows_out=len(df_work))
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def watch_data_version(loaded_version: int):
+    # nouvelle version publiée pendant que la page est ouverte : rerun complet sur les nouvelles données
+    if ingest.read_version(DATA_DIR) != loaded_version:
+        st.rerun()
+
+if mode_src == "Par défaut (fichier-clean)":
+    watch_data_version(data_version)
 
 # -------------------- Filtre période --------------------
-min_date = df_work["Date de sortie"].min()
-max_date = df_work["Date de sortie"].max()
+# vues triées par date : bornes en O(1), période = tranche [i, j) par recherche dichotomique
+min_date = df_work["Date de sortie"].iloc[0]
+max_date = df_work["Date de sortie"].iloc[-1]
 date_range = st.slider(
     "🗓️ Période",
     min_value=min_date.to_pydatetime(),
     max_value=max_date.to_pydatetime(),
     value=(min_date.to_pydatetime(), max_date.to_pydatetime())
 )
-mask = (df_work["Date de sortie"] >= pd.to_datetime(date_range[0])) & (df_work["Date de sortie"] <= pd.to_datetime(date_range[1]))
-dfp = df_work.loc[mask].copy()
-st.success(f"{len(dfp)} éléments sur la période sélectionnée.")
+period_start, period_stop = periods.positions(df_work, date_range[0], date_range[1])
+st.success(f"{period_stop - period_start} éléments sur la période sélectionnée.")
+perf.lap("filtre_periode", rows_in=len(df_work), rows_out=period_stop - period_start)
+
+# Table pont href × Réalisateur de la vue campagnes : comptes réalisateurs par jointure, sans redécoupage
+bridge = None
+if mode_src == "Par défaut (fichier-clean)":
+    bridge = load_bridge_default(file_signature(directors.bridge_path(DATA_DIR)), source_signature, data_version)
+if bridge is None:
+    bridge = build_bridge_cached(digest, campagnes_view)
+work_bridge = bridge if gran_key == "campagnes" else None
 
-# -------------------- TOPS (tables, index caché) --------------------
+# Cube pré-agrégé indexé : tops et timeline = somme des mois couverts (+ mois partiels recomptés)
+cube_idx = None
+if mode_src == "Par défaut (fichier-clean)":
+    cube_idx = load_cube_default(file_signature(cube.cube_path(DATA_DIR)), source_signature, data_version)
+if cube_idx is None:
+    work_views = {"campagnes": campagnes_view, "films": films_view if films_view is not None else campagnes_view}
+    cube_idx = build_cube_cached(digest, work_views, bridge)
+
+perf.lap("pont_et_cube")
+
+# -------------------- Sections --------------------
+# Chaque section interactive est un fragment (st.fragment) : un widget ne relance que sa section,
+# les autres restent affichées telles quelles. Les paramètres communs (source, granularité, taille du TOP,
+# période) relancent toute la page, et les résultats des sections sont en cache sur ces paramètres.
+# Mesures : perf.stage() dans les fragments (un rerun partiel n'exécute pas les laps du script).
+@st.cache_data(show_spinner=False, max_entries=64)
+def top_period(digest: str, gran_key: str, label_col: str, start, end, n: int,
+               _cube_idx: dict, _df_work: pd.DataFrame, _bridge) -> pd.DataFrame:
+    bounds = (_df_work["Date de sortie"].iloc[0], _df_work["Date de sortie"].iloc[-1])
+    counts = cube.counts_between(_cube_idx, label_col, gran_key, start, end,
+                                 rows=_df_work, bounds=bounds, bridge=_bridge)
+    return ranking.top_from_counts(counts, label_col, n)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def timeline_period(digest: str, gran_key: str, start, end, _cube_idx: dict, _df_work: pd.DataFrame) -> pd.DataFrame:
+    bounds = (_df_work["Date de sortie"].iloc[0], _df_work["Date de sortie"].iloc[-1])
+    return cube.timeline_between(_cube_idx, gran_key, start, end, rows=_df_work, bounds=bounds)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compare_periods(digest: str, gran_key: str, colname: str, period_a, period_b, n: int,
+                    _views: dict, _cube_idx: dict, _bridge) -> pd.DataFrame:
+    return compare.compare_table(compare.period_counts(_views, _cube_idx, colname, gran_key, *period_a, _bridge),
+                                 compare.period_counts(_views, _cube_idx, colname, gran_key, *period_b, _bridge), n)
+
+def show_top(title: str, label_col: str):
+    st.subheader(title)
+    st.dataframe(top_period(digest, gran_key, label_col, date_range[0], date_range[1], top_n,
+                            cube_idx, df_work, work_bridge),
+                 use_container_width=True, hide_index=True)
+
+@st.fragment
+def timeline_section():
+    st.subheader("📈 Répartition mensuelle")
+    with perf.stage("timeline", rows_in=period_stop - period_start) as rec:
+        timeline_show = timeline_period(digest, gran_key, date_range[0], date_range[1], cube_idx, df_work)
+        fig = px.bar(timeline_show, x="Mois", y="Nombre")
+        st.plotly_chart(fig, use_container_width=True)
+        if st.checkbox("📄 Voir les données (timeline)", key="table_timeline"):
+            st.dataframe(timeline_show.reset_index(drop=True), use_container_width=True, hide_index=True)
+        rec["rows_out"] = len(timeline_show)
+
+CROSS_TABS = {
+    "Agence sélectionnée": ("Agence", "Choisir une agence", "ag_top",
+                            [("Production", "productions"), ("Réalisateur", "réalisateurs"), ("Client", "clients")],
+                            "Aucune agence disponible sur la période filtrée."),
+    "Réalisateur sélectionné": ("Réalisateur", "Choisir un réalisateur", "real_top",
+                                [("Production", "productions"), ("Agence", "agences"), ("Client", "clients")],
+                                "Aucun réalisateur disponible sur la période filtrée."),
+    "Production sélectionnée": ("Production", "Choisir une production", "prod_top",
+                                [("Agence", "agences"), ("Réalisateur", "réalisateurs"), ("Client", "clients")],
+                                "Aucune production disponible sur la période filtrée."),
+    "Client sélectionné": ("Client", "Choisir un client", "client_top",
+                           [("Agence", "agences"), ("Production", "productions"), ("Réalisateur", "réalisateurs")],
+                           "Aucun client disponible sur la période filtrée."),
+}
+
+def render_cross_tab(cross_idx: dict, dim: str, prompt: str, key: str, others, empty_msg: str):
+    in_period = slice(period_start, period_stop)
+    values = cross_index.entity_values(cross_idx, dim, in_period)
+    if not values:
+        st.info(empty_msg)
+        return
+    sel = st.selectbox(prompt, values, key=key)
+    for col, (other, label) in zip(st.columns(3), others):
+        with col:
+            st.markdown(f"**Top {top_n} {label}**")
+            st.dataframe(cross_index.cross_top(cross_idx, df_work, dim, sel, other, top_n, in_period), use_container_width=True, hide_index=True)
+
+@st.fragment
+def cross_section():
+    st.subheader("🔁 Analyses croisées (TOP) — triptyques")
+    # un seul onglet calculé : celui qui est affiché (st.tabs exécuterait les quatre)
+    tab = st.segmented_control("Analyse croisée", list(CROSS_TABS), default=list(CROSS_TABS)[0],
+                               key="cross_tab", label_visibility="collapsed")
+    if tab is None:
+        return
+    dim, prompt, key, others, empty_msg = CROSS_TABS[tab]
+    # index inversé construit une fois par jeu de données / granularité : sélection = lecture d'index
+    with perf.stage("index_croise", rows_in=len(df_work)):
+        cross_idx = cross_index_cached(digest, gran_key, df_work, work_bridge)
+    with perf.stage(f"analyse_croisee[{dim}]", rows_in=period_stop - period_start):
+        render_cross_tab(cross_idx, dim, prompt, key, others, empty_msg)
+
+@st.fragment
+def compare_section():
+    st.subheader("📊 Mode comparaison (deux périodes) — choisir le Top à comparer")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        a1, a2 = st.date_input("Période A", [min_date.date(), (min_date + pd.Timedelta(days=30)).date()])
+    with col2:
+        b1, b2 = st.date_input("Période B", [(min_date + pd.Timedelta(days=31)).date(), (min_date + pd.Timedelta(days=61)).date()])
+
+    top_choice = st.selectbox("Comparer :", ["Client", "Agence", "Production", "Réalisateur"], index=0)
+
+    label_map = {"Client": "Top clients", "Agence": "Top agences", "Production": "Top productions", "Réalisateur": "Top réalisateurs"}
+    with perf.stage("comparaison"):
+        st.markdown(f"**{label_map[top_choice]} (TOP {top_n})**")
+        st.dataframe(compare_periods(digest, gran_key, top_choice, (a1, a2), (b1, b2), top_n, views, cube_idx, bridge),
+                     use_container_width=True, hide_index=True)
+
+@st.fragment
+def trends_section():
+    st.subheader("🚀 Tendances — plus fortes progressions")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        trend_dim = st.selectbox("Dimension", ["Agence", "Production", "Réalisateur", "Client"], index=0, key="trend_dim")
+    with col2:
+        trend_window = st.selectbox("Fenêtre (mois)", [3, 6, 12], index=1, key="trend_window")
+    with col3:
+        trend_by = st.selectbox("Classer par", trends.RANK_BY, index=0, key="trend_by")
+
+    with perf.stage("tendances"):
+        matrix = month_matrix_cached(digest, trend_dim, gran_key, cube_idx)
+        if matrix is None:
+            st.info("Aucune donnée pour les tendances.")
+            return
+        # deux fenêtres consécutives de mois complets se terminant au mois de fin de la période filtrée
+        _, _, recent_months, previous_months = trends.window_sums(matrix, trend_window, date_range[1])
+        if len(previous_months):
+            st.caption(f"{recent_months[0]:%m/%Y} → {recent_months[-1]:%m/%Y} comparé à "
+                       f"{previous_months[0]:%m/%Y} → {previous_months[-1]:%m/%Y}")
+        rising_df = trends.rising(matrix, trend_window, date_range[1], n=top_n, by=trend_by)
+        if rising_df.empty:
+            st.info("Aucune progression sur ces fenêtres.")
+            return
+        st.dataframe(rising_df, use_container_width=True, hide_index=True)
+        curves = trends.rolling_frame(matrix, trend_window, rising_df["Nom"].head(5), date_range[0], date_range[1])
+        fig = px.line(curves, x="Mois", y="Nombre", color="Nom",
+                      labels={"Nombre": f"Cumul glissant {trend_window} mois"})
+        st.plotly_chart(fig, use_container_width=True)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def report_bytes(digest: str, gran_key: str, start, end, n: int, fmt: str,
+                 _views: dict, _cube_idx: dict, _cross_idx: dict, _bridge) -> bytes:
+    tables = report.report_tables(_views, _cube_idx, _cross_idx, gran_key, start, end, n=n, bridge=_bridge)
+    buf = io.BytesIO()
+    if fmt == "xlsx":
+        report.write_xlsx(tables, buf)
+    else:
+        report.write_csv_zip(tables, buf)
+    return buf.getvalue()
+
+@st.fragment
+def report_section():
+    st.subheader("📥 Rapport de la période")
+    st.caption("Tops, timeline, analyses croisées et comparaison avec la période précédente de même durée.")
+    fmt = st.radio("Format", ["xlsx", "csv"], horizontal=True, key="report_fmt",
+                   format_func=lambda f: "Classeur Excel" if f == "xlsx" else "CSV (archive zip)")
+    # construit à la demande seulement (index croisé et tables en cache ensuite)
+    if not st.button("Préparer le rapport", key="report_build"):
+        return
+    with perf.stage("rapport", rows_in=period_stop - period_start):
+        cross_idx = cross_index_cached(digest, gran_key, df_work, work_bridge)
+        data = report_bytes(digest, gran_key, date_range[0], date_range[1], top_n, fmt,
+                            views, cube_idx, cross_idx, bridge)
+    name = f"rapport_{date_range[0]:%Y-%m-%d}_{date_range[1]:%Y-%m-%d}_{gran_key}"
+    mime = ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" if fmt == "xlsx"
+            else "application/zip")
+    st.download_button("Télécharger", data, file_name=f"{name}.{'xlsx' if fmt == 'xlsx' else 'zip'}",
+                       mime=mime, on_click="ignore", key="report_download")
+
+# -------------------- TOPS (tables, en cache) --------------------
 c1, c2 = st.columns(2)
 with c1:
-    st.subheader("🏆 Top clients")
-    st.dataframe(top_df(dfp, "Client", top_n), use_container_width=True, hide_index=True)
-
-    st.subheader("🏆 Top productions")
-    st.dataframe(top_df(dfp, "Production", top_n), use_container_width=True, hide_index=True)
-
+    show_top("🏆 Top clients", "Client")
+    show_top("🏆 Top productions", "Production")
 with c2:
-    st.subheader("🏆 Top agences")
-    st.dataframe(top_df(dfp, "Agence", top_n), use_container_width=True, hide_index=True)
-
-    st.subheader("🏆 Top réalisateurs")
-    if granularity.startswith("Campagnes"):
-        st.dataframe(top_director_by_campaigns(dfp, top_n), use_container_width=True, hide_index=True)
-    else:
-        st.dataframe(top_df(dfp, "Réalisateur", top_n), use_container_width=True, hide_index=True)
-
-# -------------------- Timeline (chart par défaut) --------------------
-st.subheader("📈 Répartition mensuelle")
-timeline = dfp.groupby(dfp["Date de sortie"].dt.to_period("M")).size().reset_index(name="Nombre")
-timeline["Mois"] = timeline["Date de sortie"].dt.to_timestamp()
-timeline_show = timeline[["Mois", "Nombre"]].sort_values("Mois")
-fig = px.bar(timeline_show, x="Mois", y="Nombre")
-st.plotly_chart(fig, use_container_width=True)
-if st.checkbox("📄 Voir les données (timeline)", key="table_timeline"):
-    st.dataframe(timeline_show.reset_index(drop=True), use_container_width=True, hide_index=True)
-
-# -------------------- Analyses croisées (TOP N, triptiques) --------------------
-st.subheader("🔁 Analyses croisées (TOP) — triptyques")
-
-def top_for_selection(sub: pd.DataFrame, col: str, n: int, count_by_campaigns_director=False):
-    if count_by_campaigns_director and col == "Réalisateur":
-        return top_director_by_campaigns(sub, n)
-    return top_df(sub, col, n)
-
-tab_agence, tab_real, tab_prod, tab_client = st.tabs([
-    "Agence sélectionnée", "Réalisateur sélectionné", "Production sélectionnée", "Client sélectionné"
-])
-
-with tab_agence:
-    ag_list = sorted(dfp["Agence"].dropna().unique())
-    if ag_list:
-        ag_sel = st.selectbox("Choisir une agence", ag_list, key="ag_top")
-        sub = dfp[dfp["Agence"] == ag_sel]
-        colA, colB, colC = st.columns(3)
-        with colA:
-            st.markdown(f"**Top {top_n} productions**")
-            st.dataframe(top_for_selection(sub, "Production", top_n), use_container_width=True, hide_index=True)
-        with colB:
-            st.markdown(f"**Top {top_n} réalisateurs**")
-            st.dataframe(top_for_selection(sub, "Réalisateur", top_n, count_by_campaigns_director=granularity.startswith('Campagnes')), use_container_width=True, hide_index=True)
-        with colC:
-            st.markdown(f"**Top {top_n} clients**")
-            st.dataframe(top_for_selection(sub, "Client", top_n), use_container_width=True, hide_index=True)
-    else:
-        st.info("Aucune agence disponible sur la période filtrée.")
-
-with tab_real:
-    r_list = sorted(dfp["Réalisateur"].dropna().unique())
-    if r_list:
-        r_sel = st.selectbox("Choisir un réalisateur", r_list, key="real_top")
-        sub = dfp[dfp["Réalisateur"] == r_sel]
-        colA, colB, colC = st.columns(3)
-        with colA:
-            st.markdown(f"**Top {top_n} productions**")
-            st.dataframe(top_for_selection(sub, "Production", top_n), use_container_width=True, hide_index=True)
-        with colB:
-            st.markdown(f"**Top {top_n} agences**")
-            st.dataframe(top_for_selection(sub, "Agence", top_n), use_container_width=True, hide_index=True)
-        with colC:
-            st.markdown(f"**Top {top_n} clients**")
-            st.dataframe(top_for_selection(sub, "Client", top_n), use_container_width=True, hide_index=True)
-    else:
-        st.info("Aucun réalisateur disponible sur la période filtrée.")
-
-with tab_prod:
-    p_list = sorted(dfp["Production"].dropna().unique())
-    if p_list:
-        p_sel = st.selectbox("Choisir une production", p_list, key="prod_top")
-        sub = dfp[dfp["Production"] == p_sel]
-        colA, colB, colC = st.columns(3)
-        with colA:
-            st.markdown(f"**Top {top_n} agences**")
-            st.dataframe(top_for_selection(sub, "Agence", top_n), use_container_width=True, hide_index=True)
-        with colB:
-            st.markdown(f"**Top {top_n} réalisateurs**")
-            st.dataframe(top_for_selection(sub, "Réalisateur", top_n, count_by_campaigns_director=granularity.startswith('Campagnes')), use_container_width=True, hide_index=True)
-        with colC:
-            st.markdown(f"**Top {top_n} clients**")
-            st.dataframe(top_for_selection(sub, "Client", top_n), use_container_width=True, hide_index=True)
-    else:
-        st.info("Aucune production disponible sur la période filtrée.")
-
-with tab_client:
-    c_list = sorted(dfp["Client"].dropna().unique())
-    if c_list:
-        c_sel = st.selectbox("Choisir un client", c_list, key="client_top")
-        sub = dfp[dfp["Client"] == c_sel]
-        colA, colB, colC = st.columns(3)
-        with colA:
-            st.markdown(f"**Top {top_n} agences**")
-            st.dataframe(top_for_selection(sub, "Agence", top_n), use_container_width=True, hide_index=True)
-        with colB:
-            st.markdown(f"**Top {top_n} productions**")
-            st.dataframe(top_for_selection(sub, "Production", top_n), use_container_width=True, hide_index=True)
-        with colC:
-            st.markdown(f"**Top {top_n} réalisateurs**")
-            st.dataframe(top_for_selection(sub, "Réalisateur", top_n, count_by_campaigns_director=granularity.startswith('Campagnes')), use_container_width=True, hide_index=True)
-    else:
-        st.info("Aucun client disponible sur la période filtrée.")
-
-# -------------------- Mode comparaison (deux périodes) --------------------
-st.subheader("📊 Mode comparaison (deux périodes) — choisir le Top à comparer")
-
-col1, col2 = st.columns(2)
-with col1:
-    a1, a2 = st.date_input("Période A", [min_date.date(), (min_date + pd.Timedelta(days=30)).date()])
-with col2:
-    b1, b2 = st.date_input("Période B", [(min_date + pd.Timedelta(days=31)).date(), (min_date + pd.Timedelta(days=61)).date()])
-
-top_choice = st.selectbox("Comparer :", ["Client", "Agence", "Production", "Réalisateur"], index=0)
-
-# Reconstituer la vue adaptée (base_df normalisé garanti)
-def view_for_period(df_all: pd.DataFrame, start, end):
-    sub = df_all[(df_all["Date de sortie"] >= pd.to_datetime(start)) & (df_all["Date de sortie"] <= pd.to_datetime(end))].copy()
-    if granularity.startswith("Campagnes"):
-        if detect_granularity(sub) == "films":
-            return aggregate_campaigns_from_films(sub)
-        return sub
-    else:
-        return sub
-
-dfa_view = view_for_period(base_df, a1, a2)
-dfb_view = view_for_period(base_df, b1, b2)
-
-def compare_block(dfA, dfB, colname, label, n: int, key="cmp"):
-    def clean_labels(s: pd.Series) -> pd.Series:
-        s = s.astype(str).str.strip()
-        s = s.replace({"": "Inconnu", "nan": "Inconnu", "None": "Inconnu"})
-        return s
-
-    if granularity.startswith("Campagnes") and colname == "Réalisateur":
-        # Exploser côté campagnes pour compter 1 par href
-        def explode_reals(df_in: pd.DataFrame):
-            base = df_in.copy()
-            lists = base["Réalisateur"].fillna("Inconnu").astype(str).apply(lambda s: [r for r in SPLIT_RE.split(s) if r])
-            exploded = base.loc[lists.index.repeat(lists.str.len())].copy()
-            exploded["Réalisateur"] = [r for lst in lists for r in lst]
-            return exploded.drop_duplicates(["href","Réalisateur"])
-        dfA_use = explode_reals(dfA)
-        dfB_use = explode_reals(dfB)
-    else:
-        dfA_use = dfA
-        dfB_use = dfB
-
-    colA = clean_labels(dfA_use[colname].fillna("Inconnu"))
-    colB = clean_labels(dfB_use[colname].fillna("Inconnu"))
-
-    ta = colA.value_counts().reset_index()
-    ta.columns = ["Nom", "Période A"]
-    ta = ta.head(n)
-
-    tb = colB.value_counts().reset_index()
-    tb.columns = ["Nom", "Période B"]
-    tb = tb.head(n)
-
-    comp = ta.merge(tb, on="Nom", how="outer").fillna(0)
-    comp = comp.sort_values(["Période B", "Période A"], ascending=False).reset_index(drop=True)
-    comp = comp.head(n)
-
-    comp.insert(0, "Rang", range(1, len(comp) + 1))
-    comp["Δ (B-A)"] = comp["Période B"] - comp["Période A"]
-
-    st.markdown(f"**{label} (TOP {n})**")
-    st.dataframe(comp, use_container_width=True, hide_index=True)
-
-label_map = {"Client": "Top clients", "Agence": "Top agences", "Production": "Top productions", "Réalisateur": "Top réalisateurs"}
-compare_block(dfa_view, dfb_view, top_choice, label_map[top_choice], n=top_n, key=f"cmp_{top_choice}")
\ No newline at end of file
+    show_top("🏆 Top agences", "Agence")
+    show_top("🏆 Top réalisateurs", "Réalisateur")
+
+perf.lap("tops", rows_in=period_stop - period_start)
+
+# -------------------- Timeline, analyses croisées, comparaison, tendances, rapport --------------------
+timeline_section()
+cross_section()
+compare_section()
+trends_section()
+report_section()
+
+# -------------------- Performance (caché sauf instrumentation active) --------------------
+if perf.enabled():
+    perf.flush(os.path.join(DATA_DIR, "traitement.log"))
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        runs = pd.DataFrame(perf.recent("app")).astype({"peak_mb": float})
+        last = runs[runs["run"] == runs["run"].iloc[-1]]
+        st.caption(f"Dernier rerun : {last['seconds'].sum():.3f} s")
+        st.dataframe(last[["stage", "seconds", "rows_in", "rows_out", "peak_mb"]], use_container_width=True, hide_index=True)
+        st.caption(f"Médianes sur les {runs['run'].nunique()} derniers reruns")
+        st.dataframe(runs.groupby("stage", sort=False)[["seconds", "peak_mb"]].median().reset_index(),
+                     use_container_width=True, hide_index=True)
+        ingest_runs = [r for r in perf.read_log(os.path.join(DATA_DIR, "traitement.log")) if r.get("source") == "traitement"]
+        if ingest_runs:
+            last_ingest = pd.DataFrame(ingest_runs)
+            last_ingest = last_ingest[last_ingest["run"] == last_ingest["run"].iloc[-1]]
+            st.caption(f"Dernier traitement ({last_ingest['ts'].iloc[0][:16]})")
+            st.dataframe(last_ingest[["stage", "seconds", "rows_in", "rows_out", "peak_mb"]], use_container_width=True, hide_index=True)
+perf.end()
@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import canonical
+import compare
+import cube
+import dates_fr
+import directors
+import periods
+import traitement
+import trends
+from report import build_indexes, report_tables
+from views import aggregate_campaigns_from_films, build_views, top_df, top_director_by_campaigns
+
+# Banc d'essai du pipeline (sans Streamlit) sur des exports Packshot synthétiques :
+# temps (meilleur de N passages) et pic mémoire (tracemalloc, passage séparé) par étape,
+# résultats en JSON pour comparer deux versions (--baseline).
+
+EXPORT_COLUMNS = [
+    "web-scraper-order", "web-scraper-start-url", "Film", "Film-href", "Client", "Date de sortie", "Supports",
+    "Agence", "Head of Prod", "TV Prod", "Production", "Réalisateur", "Producteur", "Directeur de prod",
+]
+MOIS_FR = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août",
+           "septembre", "octobre", "novembre", "décembre"]
+SEPARATORS = [" & ", ", ", " et ", " / ", " x ", " + "]
+SPECIAL_NAMES = {
+    "Client": ["McDonald's", "McDonald’s", "L'Oréal", "E. Leclerc", "Pom’Potes"],
+    "Agence": ["TBWA\\", "TBWA", "DDB°", "Altmann+Partners", "Jésus et Gabriel"],
+    "Production": ["\\Else", "Wanda", "Iconoclast", "Quad"],
+}
+
+# -------------------- Export synthétique --------------------
+def _names(prefix: str, n: int, dim: str | None = None) -> np.ndarray:
+    names = np.array([f"{prefix} {i:05d}" for i in range(n)], dtype=object)
+    specials = SPECIAL_NAMES.get(dim, [])[:n]
+    names[:len(specials)] = specials
+    return names
+
+def _zipf_choice(rng: np.random.Generator, names: np.ndarray, size: int) -> np.ndarray:
+    # quelques entités très fréquentes, une longue traîne (comme les vrais tops)
+    weights = 1.0 / np.arange(1, len(names) + 1) ** 0.9
+    return names[rng.choice(len(names), size=size, p=weights / weights.sum())]
+
+def french_dates(days: pd.DatetimeIndex) -> np.ndarray:
+    # "1er août 2023", "17 mai 2024" ; formatage fait une fois par jour distinct
+    codes, uniques = pd.factorize(days)
+    labels = np.array([f"{'1er' if d.day == 1 else d.day} {MOIS_FR[d.month - 1]} {d.year}" for d in uniques],
+                      dtype=object)
+    return labels[codes]
+
+def synthetic_export(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Export Packshot synthétique : mêmes colonnes, dates en français, réalisateurs multiples,
+    href répétés (plusieurs films par campagne)."""
+    rng = np.random.default_rng(seed)
+    n_campaigns = max(1, n_rows // 2)
+    campaign = np.sort(rng.integers(0, n_campaigns, n_rows))
+    first_day = rng.integers(0, 11 * 365, n_campaigns)
+    days = pd.Timestamp("2015-01-01") + pd.to_timedelta(first_day[campaign] + rng.integers(0, 45, n_rows), unit="D")
+
+    clients = _zipf_choice(rng, _names("Client", max(50, n_rows // 20), "Client"), n_campaigns)[campaign]
+    agences = _zipf_choice(rng, _names("Agence", max(30, n_rows // 100), "Agence"), n_campaigns)[campaign]
+    productions = _zipf_choice(rng, _names("Production", max(30, n_rows // 80), "Production"), n_campaigns)[campaign]
+
+    reals = _zipf_choice(rng, _names("Réalisateur", max(50, n_rows // 10)), n_rows)
+    kind = rng.random(n_rows)
+    multi = kind < 0.15
+    seconds = _zipf_choice(rng, _names("Réalisateur", max(50, n_rows // 10)), int(multi.sum()))
+    seps = np.array(SEPARATORS, dtype=object)[rng.integers(0, len(SEPARATORS), int(multi.sum()))]
+    reals[multi] = reals[multi] + seps + seconds
+    reals = reals.astype(object)
+    reals[(kind >= 0.15) & (kind < 0.18)] = np.nan
+    reals[(kind >= 0.18) & (kind < 0.20)] = ""
+
+    order = pd.Series(np.arange(n_rows)).astype(str)
+    hrefs = "https://www.packshotmag.com/films/campagne-" + pd.Series(campaign).astype(str) + "/"
+    df = pd.DataFrame({
+        "web-scraper-order": ("1756287476-" + order).to_numpy(),
+        "web-scraper-start-url": ("https://www.packshotmag.com/films/page/" + pd.Series(campaign // 25).astype(str) + "/").to_numpy(),
+        "Film": ("Film " + order).to_numpy(),
+        "Film-href": hrefs.to_numpy(),
+        "Client": clients,
+        "Date de sortie": french_dates(pd.DatetimeIndex(days)),
+        "Supports": np.where(rng.random(n_rows) < 0.7, "TV", "Dispositif TV, digital, réseaux sociaux"),
+        "Agence": agences,
+        "Head of Prod": _zipf_choice(rng, _names("Head", 200), n_rows),
+        "TV Prod": np.where(rng.random(n_rows) < 0.5, "", _zipf_choice(rng, _names("TV Prod", 200), n_rows)),
+        "Production": productions,
+        "Réalisateur": reals,
+        "Producteur": _zipf_choice(rng, _names("Producteur", 300), n_rows),
+        "Directeur de prod": _zipf_choice(rng, _names("Directeur", 300), n_rows),
+    })
+    # export non trié, comme le scraper
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)[EXPORT_COLUMNS]
+
+def write_export(df: pd.DataFrame, path: str) -> str:
+    if path.lower().endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine="openpyxl")
+    return path
+
+# -------------------- Versions de référence --------------------
+def _first_non_null(series: pd.Series):
+    for v in series:
+        if pd.notna(v) and str(v).strip() != "":
+            return v
+    return "Inconnu"
+
+def aggregate_campaigns_loop(df_films: pd.DataFrame) -> pd.DataFrame:
+    """aggregate_campaigns_from_films d'origine (apply et lambdas par groupe) : référence du test
+    d'équivalence et de la mesure ancienne / nouvelle version."""
+    df = df_films.copy()
+    for col in ["Client","Agence","Production","Réalisateur"]:
+        if col not in df.columns:
+            df[col] = "Inconnu"
+
+    df["_Reals_list"] = (
+        df["Réalisateur"].fillna("Inconnu").astype(str).apply(lambda s: [r for r in directors.SPLIT_RE.split(s) if r])
+    )
+
+    agg = df.sort_values("Date de sortie").groupby("href").agg({
+        "Date de sortie": "min",
+        "Client": _first_non_null,
+        "Agence": _first_non_null,
+        "Production": _first_non_null,
+        "_Reals_list": lambda lists: sorted(set(sum(lists, []))),
+    }).reset_index()
+
+    agg["Réalisateur"] = agg["_Reals_list"].apply(lambda lst: " & ".join(lst) if lst else "Inconnu")
+    return agg.drop(columns=["_Reals_list"])
+
+# -------------------- Mesures --------------------
+def measure(stage: str, n_rows: int, fn, repeat: int = 3, setup=None) -> dict:
+    """Meilleur temps sur `repeat` passages, puis un passage sous tracemalloc pour le pic mémoire."""
+    times, out = [], None
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        t0 = time.perf_counter()
+        out = fn(*args)
+        times.append(time.perf_counter() - t0)
+    args = setup() if setup else ()
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "stage": stage,
+        "rows": n_rows,
+        "rows_out": len(out) if hasattr(out, "__len__") else None,
+        "seconds": round(min(times), 6),
+        "seconds_all": [round(t, 6) for t in times],
+        "peak_mb": round(peak / 2**20, 3),
+    }
+
+def _cold_dates(*args):
+    # dates analysées à froid à chaque passage (pas de mémo en mémoire ni de cache disque)
+    dates_fr._caches.clear()
+    return args
+
+def _cold_aliases(*args):
+    # noms rapprochés à froid à chaque passage (aucun alias mémorisé)
+    canonical._caches.clear()
+    return args
+
+def _quiet(fn, *args, **kwargs):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return fn(*args, **kwargs)
+
+def bench_size(n_rows: int, repeat: int = 3, seed: int = 0, xlsx_max: int = 100_000, workdir: str = ".") -> list:
+    results = []
+    raw = synthetic_export(n_rows, seed)
+
+    if n_rows <= xlsx_max:
+        xlsx = write_export(raw, os.path.join(workdir, f"packshot_{n_rows}.xlsx"))
+        results.append(measure("prepare_from_raw", n_rows, lambda: traitement.prepare_from_raw(xlsx)[1],
+                               repeat, setup=_cold_dates))
+    results.append(measure("normalize_raw", n_rows, traitement.normalize_raw,
+                           repeat, setup=lambda: _cold_dates(raw.copy())))
+
+    films_new = traitement.normalize_raw(raw.copy())
+    results.append(measure("canonical_names", n_rows, canonical.canonicalize_names,
+                           repeat, setup=lambda: _cold_aliases(films_new)))
+    campagnes_new = films_new.drop_duplicates(subset="href")
+    half = films_new["Date de sortie"].quantile(0.5)
+
+    def merge_setup(initial: bool):
+        outdir = tempfile.mkdtemp(dir=workdir)
+        if not initial:
+            # historique = première moitié, nouvel export = seconde moitié + recouvrement
+            old = films_new[films_new["Date de sortie"] <= half]
+            _quiet(traitement.incremental_merge, old.drop_duplicates(subset="href"), old, outdir)
+            new = films_new[films_new["Date de sortie"] >= films_new["Date de sortie"].quantile(0.4)]
+            return new.drop_duplicates(subset="href"), new, outdir
+        return campagnes_new, films_new, outdir
+
+    results.append(measure("incremental_merge_initial", n_rows,
+                           lambda c, f, d: _quiet(traitement.incremental_merge, c, f, d),
+                           repeat, setup=lambda: merge_setup(True)))
+    results.append(measure("incremental_merge_update", n_rows,
+                           lambda c, f, d: _quiet(traitement.incremental_merge, c, f, d),
+                           repeat, setup=lambda: merge_setup(False)))
+
+    # ancienne / nouvelle version de l'agrégation films -> campagnes (boucle d'origine limitée en taille)
+    if n_rows <= xlsx_max:
+        results.append(measure("aggregate_campaigns[boucle]", n_rows, lambda: aggregate_campaigns_loop(films_new), repeat))
+    results.append(measure("aggregate_campaigns", n_rows, lambda: aggregate_campaigns_from_films(films_new), repeat))
+
+    results.append(measure("build_views", n_rows, lambda: build_views(films_new)[0], repeat))
+    campagnes, films, detected, base_df = (
+        periods.sort_by_date(v) if isinstance(v, pd.DataFrame) else v for v in build_views(films_new)
+    )
+    views = {"campagnes": campagnes, "films": films, "detected": detected, "base_df": base_df}
+
+    results.append(measure("build_bridge", len(campagnes), lambda: directors.build_bridge(campagnes), repeat))
+    bridge = directors.build_bridge(campagnes)
+    work = {"campagnes": campagnes, "films": films if films is not None else campagnes}
+    results.append(measure("cube_from_views", n_rows, lambda: cube.cube_from_views(work, bridge), repeat))
+    cube_df = cube.cube_from_views(work, bridge)
+    results.append(measure("index_cube", len(cube_df), lambda: cube.index_cube(cube_df), repeat))
+    cube_idx = cube.index_cube(cube_df)
+
+    for dim in ["Client", "Production"]:
+        results.append(measure(f"top_df[{dim}]", len(campagnes), lambda d=dim: top_df(campagnes, d, 20), repeat))
+    results.append(measure("top_director_by_campaigns", len(campagnes),
+                           lambda: top_director_by_campaigns(campagnes, 20), repeat))
+    results.append(measure("top_director_by_campaigns[pont]", len(campagnes),
+                           lambda: top_director_by_campaigns(campagnes, 20, bridge), repeat))
+
+    # périodes A/B décalées d'un an, bornes en milieu de mois (mois partiels recomptés)
+    d0, d1 = campagnes["Date de sortie"].iloc[0], campagnes["Date de sortie"].iloc[-1]
+    a = (d0 + (d1 - d0) * 0.25, d0 + (d1 - d0) * 0.5)
+    b = (a[0] + pd.Timedelta(days=365), a[1] + pd.Timedelta(days=365))
+    for gran in ["campagnes", "films"]:
+        for dim in ["Client", "Réalisateur"]:
+            results.append(measure(
+                f"compare_block[{gran},{dim}]", n_rows,
+                lambda g=gran, d=dim: compare.compare_table(
+                    compare.period_counts(views, cube_idx, d, g, *a, bridge),
+                    compare.period_counts(views, cube_idx, d, g, *b, bridge), 20),
+                repeat))
+    results.append(measure("month_matrix[Agence]", len(cube_df),
+                           lambda: trends.month_matrix(cube_idx, "Agence", "campagnes"), repeat))
+    matrix = trends.month_matrix(cube_idx, "Agence", "campagnes")
+    results.append(measure("rising[Agence]", len(matrix["values"]),
+                           lambda: trends.rising(matrix, 6, n=20), repeat))
+    cross_idx = build_indexes(views, "campagnes", bridge)
+    results.append(measure("report_tables", n_rows,
+                           lambda: report_tables(views, cube_idx, cross_idx, "campagnes", *b, n=20, bridge=bridge),
+                           repeat))
+    return results
+
+# -------------------- Rapport / régressions --------------------
+def run(sizes, repeat: int = 3, seed: int = 0, xlsx_max: int = 100_000) -> dict:
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": [],
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # hors du dépôt : pas de cache de dates sur disque ni d'écriture dans fichier-clean/
+        os.chdir(workdir)
+        try:
+            for n in sizes:
+                for res in bench_size(n, repeat, seed, xlsx_max, workdir):
+                    report["results"].append(res)
+                    print(f"{res['rows']:>9} {res['stage']:<40} {res['seconds']:>10.4f} s {res['peak_mb']:>10.1f} Mo",
+                          file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+    return report
+
+def regressions(report: dict, baseline: dict, threshold: float = 1.5) -> list:
+    """Étapes (stage, rows) dont le temps dépasse threshold × celui de la référence."""
+    ref = {(r["stage"], r["rows"]): r for r in baseline["results"]}
+    out = []
+    for r in report["results"]:
+        old = ref.get((r["stage"], r["rows"]))
+        if old and old["seconds"] > 0 and r["seconds"] > threshold * old["seconds"]:
+            out.append({"stage": r["stage"], "rows": r["rows"], "seconds": r["seconds"],
+                        "baseline": old["seconds"], "ratio": round(r["seconds"] / old["seconds"], 2)})
+    return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc d'essai du pipeline Packshot sur des exports synthétiques.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="nombres de lignes films à générer (ex. 1000 10000 100000 1000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="passages chronométrés par étape (meilleur retenu)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--xlsx-max", type=int, default=100_000,
+                        help="au-delà, prepare_from_raw (lecture xlsx) et la boucle d'origine d'agrégation "
+                             "ne sont pas mesurés")
+    parser.add_argument("--output", help="fichier JSON de résultats (défaut : sortie standard)")
+    parser.add_argument("--baseline", help="résultats JSON de référence : code de sortie 1 si régression")
+    parser.add_argument("--threshold", type=float, default=1.5, help="ratio de temps toléré face à la référence")
+    parser.add_argument("--generate", metavar="CHEMIN",
+                        help="écrire seulement un export synthétique (.xlsx ou .csv) de --sizes[0] lignes")
+    args = parser.parse_args()
+
+    if args.generate:
+        write_export(synthetic_export(args.sizes[0], args.seed), args.generate)
+        print(f"✅ Export synthétique : {args.generate} ({args.sizes[0]} lignes)")
+        sys.exit(0)
+
+    report = run(args.sizes, args.repeat, args.seed, args.xlsx_max)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = regressions(report, json.load(f), args.threshold)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if report.get("regressions"):
+        for r in report["regressions"]:
+            print(f"⚠️ régression {r['stage']} ({r['rows']} lignes) : {r['seconds']:.4f} s vs {r['baseline']:.4f} s "
+                  f"(×{r['ratio']})", file=sys.stderr)
+        sys.exit(1)
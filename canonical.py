@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import uuid
+import tempfile
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from directors import SPLIT_RE
+
+# Noms canoniques des entités (Client, Agence, Production, Réalisateur) avant dédoublonnage et agrégation :
+# "Sécurité Routière" / "Sécurité routière", "TBWA\" / "TBWA", "McDonald’s" / "McDonald's" -> un seul nom.
+# 1. clé normalisée (casse, accents, apostrophes, ponctuation en bord) : variantes exactes regroupées ;
+# 2. clés restantes rapprochées si elles ne diffèrent que d'une faute de frappe (distance d'édition bornée)
+#    sur un nom long, seulement au sein d'un même bloc (préfixe et numéros de la clé) ; jamais pour les
+#    personnes ("Jean Martin" et "Jean Marin" sont deux réalisateurs) ;
+# 3. alias mémorisés sur disque (nom brut -> nom canonique) : seuls les noms nouveaux sont rapprochés,
+#    et un nom déjà vu garde son nom canonique d'un passage à l'autre.
+DIMENSIONS = ["Client", "Agence", "Production", "Réalisateur"]
+FUZZY_DIMENSIONS = ["Client", "Agence", "Production"]
+ALIAS_CACHE_NAME = "alias_cache.json"
+CACHE_VERSION = 2      # alias des versions précédentes (rapprochements par ratio difflib) abandonnés
+MIN_FUZZY_LENGTH = 12  # clés plus courtes : variantes exactes seulement
+MAX_EDITS = 1          # distance d'édition maximale entre deux clés rapprochées
+BLOCK_PREFIX = 3       # bloc = 3 premiers caractères de la clé sans espaces ni ponctuation
+VERSION_KEY, GENERATION_KEY = "_version", "_generation"
+
+QUOTES = str.maketrans({"’": "'", "‘": "'", "`": "'", "´": "'", "ʼ": "'"})
+EDGE_RE = re.compile(r"^[\s\\/.,;:\-_*]+|[\s\\/.,;:\-_*]+$")
+SPACES_RE = re.compile(r"\s+")
+COMPACT_RE = re.compile(r"[\W_]+")
+DIGITS_RE = re.compile(r"\d+")
+
+_caches: dict[str, dict] = {}
+
+def alias_cache_path(outdir: str) -> str:
+    return os.path.join(outdir, ALIAS_CACHE_NAME)
+
+def name_key(raw: str) -> str:
+    """Clé de regroupement : sans accents ni casse, apostrophes unifiées, ponctuation de bord retirée."""
+    s = unicodedata.normalize("NFKD", str(raw))
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    s = s.translate(QUOTES).casefold()
+    return SPACES_RE.sub(" ", EDGE_RE.sub("", s))
+
+def _block(key: str):
+    # bloc de comparaison : préfixe compact + numéros du nom ("Publicis 1" n'est jamais rapproché de "Publicis 2") ;
+    # les noms composés (plusieurs réalisateurs) ne sont jamais rapprochés : pas de bloc
+    if SPLIT_RE.search(key):
+        return None
+    return COMPACT_RE.sub("", key)[:BLOCK_PREFIX], tuple(DIGITS_RE.findall(key))
+
+def _load_cache(path: str | None) -> dict:
+    key = path or ""
+    if key not in _caches:
+        cache = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+        if cache.get(VERSION_KEY) != CACHE_VERSION:
+            # nouveau cache (ou règles changées) : nouvelle génération, les noms déjà écrits sont à revoir
+            cache = {VERSION_KEY: CACHE_VERSION, GENERATION_KEY: uuid.uuid4().hex}
+            _save_cache(path, cache)
+        _caches[key] = cache
+    return _caches[key]
+
+def cache_generation(path: str | None) -> str:
+    """Identifiant du cache d'alias : change quand le cache est recréé (supprimé, règles modifiées)."""
+    return _load_cache(path)[GENERATION_KEY]
+
+def _save_cache(path: str | None, cache: dict) -> None:
+    if not path:
+        return
+    folder = os.path.dirname(path) or "."
+    if not os.path.isdir(folder):
+        return
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Distance de Levenshtein si elle est au plus limit, sinon limit + 1 (calcul limité à la bande utile)."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        cur = [i] + [limit + 1] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != b[j - 1]))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return min(prev[-1], limit + 1)
+
+def _fuzzy_match(key: str, block, blocks: dict, canon_of: dict) -> str | None:
+    # candidat du bloc le plus proche, à au plus MAX_EDITS modifications (noms longs seulement)
+    if len(key) < MIN_FUZZY_LENGTH:
+        return None
+    best, best_dist = None, MAX_EDITS + 1
+    for other in blocks.get(block, ()):
+        if len(other) < MIN_FUZZY_LENGTH:
+            continue
+        dist = edit_distance(key, other, MAX_EDITS)
+        if dist < best_dist or (dist == best_dist and best is not None and other < best):
+            best, best_dist = other, dist
+    return None if best is None or best_dist > MAX_EDITS else canon_of[best]
+
+def _display_rank(raw: str) -> tuple:
+    # à fréquence égale : la forme qui garde ses accents ("Sécurité routière" plutôt que "Securite routiere"),
+    # puis une casse mixte plutôt que tout en capitales ou en minuscules
+    accents = sum(1 for c in unicodedata.normalize("NFD", raw) if unicodedata.combining(c))
+    return -accents, raw.isupper() or raw.islower()
+
+def _assign(new_raw: list[str], counts: np.ndarray, aliases: dict, fuzzy: bool = True) -> None:
+    """Ajoute à aliases (nom brut -> canonique) les noms de new_raw, rapprochés des noms déjà connus."""
+    canon_of = {}
+    for raw, canon in aliases.items():
+        canon_of.setdefault(name_key(canon), canon)
+        canon_of.setdefault(name_key(raw), canon)
+    blocks = {}
+    for key in canon_of:
+        block = _block(key)
+        if block is not None:
+            blocks.setdefault(block, []).append(key)
+
+    # variantes exactes regroupées ; nom canonique : forme sans ponctuation de bord ("TBWA" plutôt que "TBWA\"),
+    # puis la plus fréquente, puis accents et casse (_display_rank), puis ordre alphabétique
+    groups = {}
+    for raw, n in zip(new_raw, counts):
+        groups.setdefault(name_key(raw), []).append((EDGE_RE.search(raw) is not None, -int(n), *_display_rank(raw), raw))
+    # groupes traités du plus fréquent au moins fréquent : une variante rare rejoint la forme courante
+    order = sorted(groups, key=lambda k: (sum(v[1] for v in groups[k]), k))
+    for key in order:
+        variants = sorted(groups[key])
+        canon = canon_of.get(key) if key else variants[0][-1]
+        if canon is None:
+            block = _block(key) if fuzzy else None
+            canon = (_fuzzy_match(key, block, blocks, canon_of) if block is not None else None) or variants[0][-1]
+            canon_of[key] = canon
+            if block is not None:
+                blocks.setdefault(block, []).append(key)
+        for *_, raw in variants:
+            aliases[raw] = canon
+
+def canonicalize(series: pd.Series, dimension: str, cache_path: str | None = None) -> pd.Series:
+    """Remplace chaque nom par son nom canonique (valeurs manquantes inchangées)."""
+    codes, uniques = pd.factorize(series)
+    if not len(uniques):
+        return series
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    mapped = np.array(canonical_names(uniques, counts, dimension, cache_path) + [np.nan], dtype=object)
+    # code -1 (valeur manquante) -> dernier élément : NaN
+    return pd.Series(mapped[codes], index=series.index, name=series.name)
+
+def canonical_names(values, counts, dimension: str, cache_path: str | None = None) -> list[str]:
+    """Noms canoniques de valeurs distinctes (counts : nombre d'occurrences de chacune)."""
+    raw = [str(v).strip() for v in values]
+    cache = _load_cache(cache_path)
+    aliases = cache.setdefault(dimension, {})
+    missing = [i for i, r in enumerate(raw) if r not in aliases]
+    if missing:
+        counts = np.asarray(counts)
+        _assign([raw[i] for i in missing], counts[missing], aliases, fuzzy=dimension in FUZZY_DIMENSIONS)
+        _save_cache(cache_path, cache)
+    return [aliases[r] for r in raw]
+
+def canonicalize_names(df: pd.DataFrame, cache_path: str | None = None, cols=DIMENSIONS) -> pd.DataFrame:
+    out = df.copy()
+    for c in cols:
+        if c in out.columns:
+            out[c] = canonicalize(out[c], c, cache_path)
+    return out
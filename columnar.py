@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Copie colonnaire typée de la vue campagnes du dashboard (Parquet, via pyarrow) :
+# seules les colonnes utiles, dimensions en catégories, dates en datetime64, un row group par année.
+# Le dashboard la lit directement, sans repasser par normalize_text_cols / ensure_date.
+COLUMNAR_NAME = "campagnes.parquet"
+VIEW_COLUMNS = ["href", "Date de sortie", "Client", "Agence", "Production", "Réalisateur"]
+CATEGORY_COLUMNS = ["Client", "Agence", "Production", "Réalisateur"]
+
+def columnar_path(outdir: str) -> str:
+    return os.path.join(outdir, COLUMNAR_NAME)
+
+def to_columnar(view: pd.DataFrame) -> pd.DataFrame:
+    """Colonnes utiles d'une vue normalisée (build_views), triées par date, dimensions en catégories."""
+    df = view[VIEW_COLUMNS].sort_values("Date de sortie", kind="stable").reset_index(drop=True)
+    df["href"] = df["href"].astype(object)
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+    return df
+
+def write_columnar(view: pd.DataFrame, outdir: str) -> str:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = to_columnar(view)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # un row group par année (lignes triées par date : tranches contiguës, sans copie)
+    years = df["Date de sortie"].dt.year.to_numpy()
+    bounds = np.concatenate([[0], np.flatnonzero(years[1:] != years[:-1]) + 1, [len(years)]])
+    path = columnar_path(outdir)
+    tmp = path + ".tmp"
+    with pq.ParquetWriter(tmp, table.schema, compression="zstd") as writer:
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if stop > start:
+                writer.write_table(table.slice(int(start), int(stop - start)))
+    os.replace(tmp, path)
+    return path
+
+def read_columnar(path: str, columns=None) -> pd.DataFrame | None:
+    """Lit uniquement `columns` (VIEW_COLUMNS par défaut) ; None si le fichier est absent."""
+    if not os.path.exists(path):
+        return None
+    import pyarrow.parquet as pq
+
+    df = pq.read_table(path, columns=columns or VIEW_COLUMNS).to_pandas()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            # catégories triées : pd.factorize(sort=True) suit l'ordre des catégories
+            cats = df[col].cat.remove_unused_categories()
+            df[col] = cats.cat.reorder_categories(sorted(cats.cat.categories))
+    return df
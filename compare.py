@@ -0,0 +1,44 @@
+import pandas as pd
+
+import cube
+import periods
+from views import aggregate_campaigns_from_films
+
+# Mode comparaison (deux périodes), sans Streamlit : partagé par le dashboard et les outils en ligne de commande.
+# `views` est le dictionnaire des vues préparées (campagnes, films, detected, base_df), triées par date.
+
+def work_table(views: dict, granularite: str) -> pd.DataFrame:
+    # table de travail pour la granularité demandée
+    if granularite == "campagnes" or views["films"] is None:
+        return views["campagnes"]
+    return views["films"]
+
+def period_counts(views: dict, cube_idx: dict, colname: str, granularite: str, start, end,
+                  bridge: pd.DataFrame | None = None) -> pd.Series:
+    """Comptes de colname sur [start, end].
+
+    Si base_df a les lignes de la table de travail : cube indexé + bords recomptés sur une tranche
+    (O(log n + mois)) ; sinon (jeu films compté en campagnes) les campagnes sont réagrégées
+    sur la tranche de films de la période."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if granularite == "campagnes" and views["detected"] == "films":
+        sub = periods.period_rows(views["base_df"], start, end)
+        if sub.empty:
+            return pd.Series(dtype=int)
+        return cube.dimension_values(aggregate_campaigns_from_films(sub), colname, granularite).value_counts()
+    work = work_table(views, granularite)
+    bounds = (work["Date de sortie"].iloc[0], work["Date de sortie"].iloc[-1]) if len(work) else None
+    return cube.counts_between(cube_idx, colname, granularite, start, end, rows=work, bounds=bounds,
+                               bridge=bridge if granularite == "campagnes" else None)
+
+def compare_table(counts_a: pd.Series, counts_b: pd.Series, n: int) -> pd.DataFrame:
+    # Top n de la période B (complété par A), comptes A et B de chaque valeur sur toutes les valeurs :
+    # une valeur du top B hors du top A garde son compte A
+    comp = pd.concat([counts_a[counts_a > 0].rename("Période A"), counts_b[counts_b > 0].rename("Période B")], axis=1)
+    comp = comp.fillna(0).astype(int).rename_axis("Nom").reset_index()
+    comp = comp.sort_values(["Période B", "Période A", "Nom"], ascending=[False, False, True], kind="stable")
+    comp = comp.reset_index(drop=True).head(n)
+
+    comp.insert(0, "Rang", range(1, len(comp) + 1))
+    comp["Δ (B-A)"] = comp["Période B"] - comp["Période A"]
+    return comp
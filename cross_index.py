@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from cube import DIMENSIONS, dimension_values
+from ranking import top_from_counts
+
+# Index inversé pour les analyses croisées : pour chaque valeur d'Agence / Client / Production /
+# Réalisateur, les positions des lignes correspondantes (format CSR : order[offsets[k]:offsets[k+1]]).
+# Les tops de co-occurrence sur l'ensemble du jeu sont précalculés pour toutes les entités.
+# La période (in_period) est un masque booléen par ligne, ou une tranche slice(i, j) de positions
+# quand df est trié par date (periods.positions) : restriction par recherche dichotomique.
+
+def build_cross_index(df: pd.DataFrame, granularite: str, bridge: pd.DataFrame | None = None) -> dict:
+    # bridge : table pont href × Réalisateur des mêmes lignes (granularité campagnes)
+    index = {"n": len(df), "granularite": granularite, "bridge": bridge, "codes": {}, "values": {},
+             "order": {}, "offsets": {}, "pairs": {}, "pair_offsets": {}}
+    df = df.reset_index(drop=True)
+    for dim in DIMENSIONS:
+        codes, values = pd.factorize(df[dim], sort=True)
+        index["codes"][dim] = codes
+        index["values"][dim] = np.asarray(values, dtype=object)
+        valid = codes >= 0
+        order = np.flatnonzero(valid)[np.argsort(codes[valid], kind="stable")]
+        index["order"][dim] = order
+        index["offsets"][dim] = np.concatenate([[0], np.cumsum(np.bincount(codes[valid], minlength=len(values)))])
+
+    # co-occurrences (entité, autre dimension) sur tout le jeu, triées par entité puis effectif décroissant
+    for other in DIMENSIONS:
+        other_values = dimension_values(df, other, granularite, bridge)
+        for dim in DIMENSIONS:
+            if dim == other:
+                continue
+            codes = index["codes"][dim][other_values.index.to_numpy()]
+            pairs = pd.DataFrame({"code": codes, other: other_values.to_numpy()})
+            pairs = pairs[pairs["code"] >= 0].groupby(["code", other]).size().reset_index(name="Nombre")
+            pairs = pairs.sort_values(["code", "Nombre", other], ascending=[True, False, True], kind="stable")
+            pairs = pairs.reset_index(drop=True)
+            index["pairs"][(dim, other)] = pairs
+            index["pair_offsets"][(dim, other)] = np.searchsorted(
+                pairs["code"].to_numpy(), np.arange(len(index["values"][dim]) + 1)
+            )
+    return index
+
+def _full_period(index: dict, in_period) -> bool:
+    if in_period is None:
+        return True
+    if isinstance(in_period, slice):
+        return in_period.start <= 0 and in_period.stop >= index["n"]
+    return bool(in_period.all())
+
+def entity_values(index: dict, dim: str, in_period: np.ndarray | slice | None = None) -> list:
+    """Valeurs triées présentes sur la période (masque booléen par ligne), toutes sinon."""
+    codes = index["codes"][dim]
+    if in_period is not None:
+        codes = codes[in_period]
+    present = np.bincount(codes[codes >= 0], minlength=len(index["values"][dim])) > 0
+    return list(index["values"][dim][present])
+
+def entity_positions(index: dict, dim: str, value, in_period: np.ndarray | slice | None = None) -> np.ndarray:
+    k = np.searchsorted(index["values"][dim], value)
+    if k >= len(index["values"][dim]) or index["values"][dim][k] != value:
+        return np.empty(0, dtype=np.int64)
+    start, stop = index["offsets"][dim][k], index["offsets"][dim][k + 1]
+    pos = index["order"][dim][start:stop]
+    if isinstance(in_period, slice):
+        # positions croissantes pour une même valeur
+        pos = pos[np.searchsorted(pos, in_period.start):np.searchsorted(pos, in_period.stop)]
+    elif in_period is not None:
+        pos = pos[in_period[pos]]
+    return pos
+
+def cross_top(index: dict, df: pd.DataFrame, dim: str, value, other: str, n: int,
+              in_period: np.ndarray | slice | None = None) -> pd.DataFrame:
+    """Top n de `other` parmi les lignes où dim == value (présentation de top_df)."""
+    if _full_period(index, in_period):
+        k = np.searchsorted(index["values"][dim], value)
+        if k < len(index["values"][dim]) and index["values"][dim][k] == value:
+            start, stop = index["pair_offsets"][(dim, other)][k:k + 2]
+            pairs = index["pairs"][(dim, other)].iloc[start:stop]
+            return top_from_counts(pairs.set_index(other)["Nombre"], other, n)
+    sub = df.iloc[entity_positions(index, dim, value, in_period)]
+    counts = dimension_values(sub, other, index["granularite"], index["bridge"]).value_counts()
+    return top_from_counts(counts, other, n)
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+import pandas as pd
+
+import periods
+from directors import campaign_directors
+from views import build_views
+
+# Cube pré-agrégé : nombre de lignes par (mois, dimension, valeur, granularité).
+# Les tops et la timeline d'une période s'obtiennent en sommant les mois couverts (sommes cumulées
+# par mois, cf. index_cube) ; seuls les mois partiellement couverts sont recomptés depuis les lignes,
+# retrouvées par recherche dichotomique dans la table triée par date.
+CUBE_NAME = "cube.csv"
+DIMENSIONS = ["Client", "Agence", "Production", "Réalisateur"]
+TOTAL = "Total"
+CUBE_COLUMNS = ["Mois", "Dimension", "Valeur", "Granularite", "Nombre"]
+
+def cube_path(outdir: str) -> str:
+    return os.path.join(outdir, CUBE_NAME)
+
+def dimension_values(df: pd.DataFrame, dimension: str, granularite: str,
+                     bridge: pd.DataFrame | None = None) -> pd.Series:
+    """Valeurs comptées pour une dimension, indexées comme df (index répété si réalisateurs multiples)."""
+    if dimension == TOTAL:
+        return pd.Series("Tous", index=df.index)
+    if dimension == "Réalisateur" and granularite == "campagnes":
+        # même règle que top_director_by_campaigns : 1 campagne par réalisateur
+        return campaign_directors(df, bridge)
+    return df[dimension]
+
+def count_by_month(df: pd.DataFrame, dimension: str, granularite: str,
+                   bridge: pd.DataFrame | None = None) -> pd.Series:
+    values = dimension_values(df, dimension, granularite, bridge)
+    mois = df["Date de sortie"].dt.to_period("M").dt.to_timestamp().loc[values.index]
+    return values.groupby([mois.to_numpy(), values.to_numpy()]).size()
+
+def work_views(df_raw: pd.DataFrame, dates_cache: str | None = None) -> dict:
+    # tables de travail du dashboard pour chaque granularité
+    campagnes, films, _, _ = build_views(df_raw, dates_cache)
+    return {"campagnes": campagnes, "films": films if films is not None else campagnes}
+
+def cube_from_views(views: dict, bridge: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Cube des tables de travail (work_views) ; bridge : table pont de views["campagnes"]."""
+    parts = []
+    for granularite, df in views.items():
+        for dimension in DIMENSIONS + [TOTAL]:
+            counts = count_by_month(df, dimension, granularite, bridge if granularite == "campagnes" else None)
+            part = counts.rename_axis(["Mois", "Valeur"]).reset_index(name="Nombre")
+            part["Dimension"] = dimension
+            part["Granularite"] = granularite
+            parts.append(part)
+    cube = pd.concat(parts, ignore_index=True)[CUBE_COLUMNS]
+    return cube.sort_values(["Granularite", "Dimension", "Mois", "Valeur"], kind="stable").reset_index(drop=True)
+
+def write_cube(cube: pd.DataFrame, outdir: str) -> str:
+    path = cube_path(outdir)
+    tmp = path + ".tmp"
+    out = cube.copy()
+    out["Mois"] = out["Mois"].dt.strftime("%Y-%m")
+    out.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+def read_cube(path: str) -> pd.DataFrame | None:
+    if not os.path.exists(path):
+        return None
+    cube = pd.read_csv(path, dtype={"Valeur": str}, keep_default_na=False)
+    cube["Mois"] = pd.to_datetime(cube["Mois"], format="%Y-%m")
+    return cube
+
+def index_cube(cube: pd.DataFrame) -> dict:
+    """Par (dimension, granularité) : mois et valeurs triés, sommes cumulées valeur × mois
+
+    (cum[:, k] = total des k premiers mois) : une plage de mois se somme sans balayer le cube."""
+    index = {}
+    for (dimension, granularite), part in cube.groupby(["Dimension", "Granularite"], sort=False):
+        m_codes, months = pd.factorize(part["Mois"], sort=True)
+        v_codes, values = pd.factorize(part["Valeur"], sort=True)
+        counts = np.zeros((len(values), len(months) + 1), dtype=np.int64)
+        np.add.at(counts, (v_codes, m_codes + 1), part["Nombre"].to_numpy())
+        index[(dimension, granularite)] = {
+            "months": pd.DatetimeIndex(months),
+            "values": np.asarray(values, dtype=object),
+            "cum": counts.cumsum(axis=1).astype(np.int32),
+        }
+    return index
+
+def _covered_months(months: pd.Series, start, end, bounds=None) -> pd.Series:
+    # un mois est couvert si la période contient toutes ses dates (bornées par l'étendue des données)
+    m_start = months
+    m_end = months + pd.offsets.MonthBegin(1) - pd.Timedelta(nanoseconds=1)
+    if bounds is not None:
+        m_start = m_start.clip(lower=pd.Timestamp(bounds[0]))
+        m_end = m_end.clip(upper=pd.Timestamp(bounds[1]))
+    return (m_start >= pd.Timestamp(start)) & (m_end <= pd.Timestamp(end))
+
+def _covered_span(months: pd.DatetimeIndex, start, end, bounds=None) -> tuple[int, int]:
+    # plage [k1, k2) des mois entièrement couverts (contiguë : mois triés)
+    covered = np.flatnonzero(_covered_months(pd.Series(months), start, end, bounds).to_numpy())
+    return (int(covered[0]), int(covered[-1]) + 1) if len(covered) else (0, 0)
+
+def _edge_rows(rows: pd.DataFrame, start, end, months: pd.DatetimeIndex, k1: int, k2: int) -> pd.DataFrame:
+    # lignes de [start, end] hors des mois couverts : au plus deux tranches de rows (triées par date)
+    if k2 <= k1:
+        return periods.period_rows(rows, start, end)
+    i0, j0 = periods.positions(rows, start, months[k1], end_inclusive=False)
+    i1, j1 = periods.positions(rows, months[k2 - 1] + pd.offsets.MonthBegin(1), end)
+    return rows.iloc[np.r_[i0:j0, i1:j1]]
+
+def counts_between(cube: dict, dimension: str, granularite: str, start, end,
+                   rows: pd.DataFrame | None = None, bounds=None, bridge: pd.DataFrame | None = None) -> pd.Series:
+    """Comptes par valeur sur [start, end] : cube indexé (index_cube) + recomptage des mois partiels
+    depuis rows (triées par date)."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    entry = cube.get((dimension, granularite))
+    if entry is None:
+        return pd.Series(dtype=int)
+    k1, k2 = _covered_span(entry["months"], start, end, bounds)
+    diff = entry["cum"][:, k2] - entry["cum"][:, k1]
+    total = pd.Series(diff, index=pd.Index(entry["values"], name="Valeur"))[diff > 0]
+    if rows is not None:
+        edge = _edge_rows(rows, start, end, entry["months"], k1, k2)
+        if len(edge):
+            extra = dimension_values(edge, dimension, granularite, bridge).value_counts()
+            total = total.add(extra, fill_value=0)
+    return total.astype(int)
+
+def timeline_between(cube: dict, granularite: str, start, end,
+                     rows: pd.DataFrame | None = None, bounds=None) -> pd.DataFrame:
+    """Timeline mensuelle (Mois, Nombre) de la période, même découpage que counts_between."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    entry = cube.get((TOTAL, granularite))
+    if entry is None:
+        return pd.DataFrame({"Mois": pd.Series(dtype="datetime64[ns]"), "Nombre": pd.Series(dtype=int)})
+    k1, k2 = _covered_span(entry["months"], start, end, bounds)
+    cum = entry["cum"][0]
+    out = pd.DataFrame({"Mois": entry["months"][k1:k2], "Nombre": cum[k1 + 1:k2 + 1] - cum[k1:k2]})
+    if rows is not None:
+        edge = _edge_rows(rows, start, end, entry["months"], k1, k2)["Date de sortie"]
+        mois = edge.dt.to_period("M").dt.to_timestamp()
+        out = pd.concat([out, mois.value_counts().rename_axis("Mois").reset_index(name="Nombre")])
+    return out.sort_values("Mois").reset_index(drop=True)
@@ -0,0 +1,93 @@
+import os
+import re
+import json
+import tempfile
+import threading
+import pandas as pd
+
+# Dates de sortie françaises ("17 mai 2024", "1er août 2023", "2024-05-17"...) :
+# chaque chaîne distincte n'est analysée qu'une fois, puis mémorisée (en mémoire et sur disque).
+FRENCH_MONTHS = {
+    "janvier": "january",
+    "février": "february", "fevrier": "february",
+    "mars": "march",
+    "avril": "april",
+    "mai": "may",
+    "juin": "june",
+    "juillet": "july",
+    "août": "august", "aout": "august",
+    "septembre": "september",
+    "octobre": "october",
+    "novembre": "november",
+    "décembre": "december", "decembre": "december",
+}
+MONTHS_RE = re.compile("|".join(sorted(map(re.escape, FRENCH_MONTHS), key=len, reverse=True)))
+SPACES_RE = re.compile(r"\s+")
+FIRST_RE = re.compile(r"\b1er\b")
+
+DATES_CACHE_NAME = "dates_cache.json"
+
+_caches: dict[str, dict] = {}
+# mémo partagé entre les threads (sessions du dashboard, watch) : lecture, complément et sauvegarde sous verrou
+_lock = threading.Lock()
+
+def dates_cache_path(outdir: str) -> str:
+    return os.path.join(outdir, DATES_CACHE_NAME)
+
+def normalize_date_string(raw: str) -> str:
+    s = MONTHS_RE.sub(lambda m: FRENCH_MONTHS[m.group(0)], raw.strip().lower())
+    s = FIRST_RE.sub("1", s)
+    return SPACES_RE.sub(" ", s)
+
+def _load_cache(path: str | None) -> dict:
+    key = path or ""
+    if key not in _caches:
+        cache = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    cache = {k: (pd.Timestamp(v) if v else pd.NaT) for k, v in json.load(f).items()}
+            except (OSError, ValueError):
+                cache = {}
+        _caches[key] = cache
+    return _caches[key]
+
+def _save_cache(path: str | None, cache: dict) -> None:
+    if not path:
+        return
+    folder = os.path.dirname(path) or "."
+    if not os.path.isdir(folder):
+        return
+    data = {k: (None if pd.isna(v) else v.isoformat()) for k, v in cache.items()}
+    # écriture atomique : fichier temporaire voisin puis os.replace
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def parse_dates_fr(series: pd.Series, cache_path: str | None = None) -> pd.Series:
+    """Convertit une colonne de dates (françaises ou ISO) en datetime64, NaT si illisible.
+
+    cache_path : cache disque des chaînes déjà analysées (dates_cache_path(outdir)) ; None : mémo en mémoire seul."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    codes, uniques = pd.factorize(series)
+    raw = [str(u) for u in uniques]
+    with _lock:
+        cache = _load_cache(cache_path)
+        missing = [r for r in raw if r not in cache]
+        if missing:
+            parsed = pd.to_datetime(
+                pd.Series([normalize_date_string(r) for r in missing], dtype=object),
+                errors="coerce", dayfirst=True, format="mixed",
+            )
+            cache.update(zip(missing, parsed))
+            _save_cache(cache_path, cache)
+        found = [cache[r] for r in raw]
+    # code -1 (valeur manquante) -> dernier élément : NaT
+    values = pd.DatetimeIndex(found + [pd.NaT]).to_numpy()
+    return pd.Series(values[codes], index=series.index, name=series.name)
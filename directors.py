@@ -0,0 +1,70 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# Réalisateurs multiples ("A & B", "A, B", "A et B"...) : règles de découpage uniques, et table pont
+# href × Réalisateur (une ligne par réalisateur d'une campagne) écrite par traitement.py.
+# Les comptes « 1 campagne par réalisateur » se font par jointure sur cette table.
+BRIDGE_NAME = "realisateurs.csv"
+BRIDGE_COLUMNS = ["href", "Réalisateur"]
+
+# split robust pour réalisateurs multiples
+SPLIT_RE = re.compile(r"\s*(?:,|/|&| x |\+| et )\s*", flags=re.IGNORECASE)
+
+def explode_directors(reals: pd.Series) -> pd.Series:
+    """Un réalisateur par ligne (index d'origine répété), selon SPLIT_RE ; vide ou manquant -> "Inconnu".
+
+    Le découpage n'est calculé qu'une fois par valeur distincte puis redistribué par code."""
+    codes, uniques = pd.factorize(reals)
+    labels = pd.Series(np.append(np.asarray(uniques, dtype=object).astype(str), "Inconnu"))
+    codes = np.where(codes < 0, len(uniques), codes)
+    parts = labels.str.split(SPLIT_RE).explode()
+    parts = parts[parts.notna() & parts.ne("")]
+    values = parts.to_numpy(dtype=object)
+    counts = np.bincount(parts.index.to_numpy(dtype=np.int64), minlength=len(labels))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    lens = counts[codes]
+    rows = np.repeat(np.arange(len(reals)), lens)
+    within = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens)
+    return pd.Series(values[offsets[codes][rows] + within], index=reals.index[rows], name=reals.name)
+
+def _campaign_pairs(df: pd.DataFrame, bridge: pd.DataFrame | None = None):
+    # (positions dans df, réalisateurs), dédoublonnés par (href, réalisateur)
+    if bridge is None:
+        reals = explode_directors(df["Réalisateur"].set_axis(np.arange(len(df))))
+        pos, values = reals.index.to_numpy(), reals.to_numpy(dtype=object)
+    else:
+        left = pd.DataFrame({"_pos": np.arange(len(df)), "href": df["href"].to_numpy()})
+        joined = left.merge(bridge[BRIDGE_COLUMNS], on="href", how="inner", sort=False)
+        pos, values = joined["_pos"].to_numpy(), joined["Réalisateur"].to_numpy(dtype=object)
+    hrefs = df["href"].to_numpy()[pos]
+    keep = ~pd.DataFrame({"href": hrefs, "Réalisateur": values}).duplicated().to_numpy()
+    return pos[keep], hrefs[keep], values[keep]
+
+def campaign_directors(df: pd.DataFrame, bridge: pd.DataFrame | None = None) -> pd.Series:
+    """Réalisateurs comptés une fois par campagne, indexés comme df (index répété si réalisateurs multiples).
+
+    Avec la table pont (construite sur les mêmes campagnes), jointure sur href au lieu du découpage."""
+    pos, _, values = _campaign_pairs(df, bridge)
+    return pd.Series(values, index=df.index[pos], name="Réalisateur")
+
+def build_bridge(campagnes: pd.DataFrame) -> pd.DataFrame:
+    """Table pont href × Réalisateur d'une vue campagnes."""
+    _, hrefs, values = _campaign_pairs(campagnes)
+    return pd.DataFrame({"href": hrefs, "Réalisateur": values})
+
+def bridge_path(outdir: str) -> str:
+    return os.path.join(outdir, BRIDGE_NAME)
+
+def write_bridge(bridge: pd.DataFrame, outdir: str) -> str:
+    path = bridge_path(outdir)
+    tmp = path + ".tmp"
+    bridge[BRIDGE_COLUMNS].to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+def read_bridge(path: str) -> pd.DataFrame | None:
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
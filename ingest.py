@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import argparse
+import contextlib
+from datetime import datetime
+
+# Ingestion en continu : un dossier de dépôt (inbox) est surveillé, chaque export déposé est fusionné
+# dans fichier-clean/ puis rangé dans inbox/traites/ (ou inbox/erreurs/ s'il n'a pas pu être fusionné).
+# Toute écriture de l'historique (surveillance, traitement.py, snapshots.py rollback / compact) se fait sous
+# verrou exclusif (fcntl) sur fichier-clean/, les fichiers sont écrits en .tmp puis renommés (os.replace),
+# et version.json est incrémenté en dernier :
+# le dashboard s'en sert comme clé de cache et se recharge dès qu'une nouvelle version est publiée.
+LOCK_NAME = ".traitement.lock"
+VERSION_NAME = "version.json"
+DONE_DIR = "traites"
+FAILED_DIR = "erreurs"
+RAW_EXTENSIONS = (".xlsx", ".xlsm")  # = traitement.RAW_EXTENSIONS (non importé : module léger pour le dashboard)
+
+def lock_path(outdir: str) -> str:
+    return os.path.join(outdir, LOCK_NAME)
+
+def version_path(outdir: str) -> str:
+    return os.path.join(outdir, VERSION_NAME)
+
+@contextlib.contextmanager
+def locked(outdir: str):
+    """Verrou exclusif sur outdir le temps du bloc ; attend si une autre fusion est en cours."""
+    os.makedirs(outdir, exist_ok=True)
+    with open(lock_path(outdir), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("⏳ Fusion déjà en cours dans un autre processus : attente du verrou…")
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def read_version(outdir: str) -> int:
+    """Numéro de version des données publiées (0 si aucune fusion enregistrée)."""
+    try:
+        with open(version_path(outdir), encoding="utf-8") as f:
+            return int(json.load(f).get("version", 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def bump_version(outdir: str, sources=()) -> int:
+    """Publie une nouvelle version (à appeler sous verrou, après l'écriture de tous les fichiers)."""
+    version = read_version(outdir) + 1
+    path = version_path(outdir)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "ts": datetime.now().isoformat(timespec="seconds"),
+                   "sources": [os.path.basename(s) for s in sources]}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return version
+
+# -------------------- Surveillance du dossier de dépôt --------------------
+def _signature(path: str):
+    info = os.stat(path)
+    return info.st_size, info.st_mtime_ns
+
+def ready_exports(inbox: str, seen: dict) -> list[str]:
+    """Exports de l'inbox inchangés depuis le passage précédent (copie terminée) ; seen est mis à jour."""
+    current = {}
+    for name in sorted(os.listdir(inbox)):
+        path = os.path.join(inbox, name)
+        if name.lower().endswith(RAW_EXTENSIONS) and not name.startswith(("~$", ".")) and os.path.isfile(path):
+            with contextlib.suppress(FileNotFoundError):
+                current[path] = _signature(path)
+    ready = [p for p, sig in current.items() if seen.get(p) == sig]
+    seen.clear()
+    seen.update(current)
+    return ready
+
+def _archive(paths, inbox: str, subdir: str) -> None:
+    target = os.path.join(inbox, subdir)
+    os.makedirs(target, exist_ok=True)
+    stamp = datetime.now().strftime("%Y-%m-%d_%Hh%M%S")
+    for path in paths:
+        shutil.move(path, os.path.join(target, f"{stamp}_{os.path.basename(path)}"))
+
+def ingest_batch(paths, inbox: str, outdir: str = "fichier-clean", **options) -> int | None:
+    """Fusionne les exports prêts (traitement.run) puis les range ; renvoie la dernière version publiée,
+    None si rien n'a pu être fusionné."""
+    import traitement
+    try:
+        version = traitement.run(paths, outdir=outdir, **options)
+    except Exception as e:
+        if len(paths) > 1:
+            # reprise export par export : seul l'export fautif est mis de côté
+            versions = [ingest_batch([p], inbox, outdir, **options) for p in paths]
+            return max((v for v in versions if v is not None), default=None)
+        print(f"❌ {os.path.basename(paths[0])} non fusionné, déplacé dans {FAILED_DIR}/ : {e}", file=sys.stderr)
+        _archive(paths, inbox, FAILED_DIR)
+        return None
+    _archive(paths, inbox, DONE_DIR)
+    print(f"✅ Version {version} publiée ({len(paths)} export(s)).")
+    return version
+
+def watch(inbox: str, outdir: str = "fichier-clean", interval: float = 10.0, once: bool = False, **options) -> None:
+    """Boucle de surveillance : un export est traité quand sa taille et sa date n'ont pas bougé
+    pendant un intervalle (copie terminée)."""
+    os.makedirs(inbox, exist_ok=True)
+    seen = {}
+    print(f"👀 Surveillance de {inbox} (toutes les {interval:g} s) → {outdir}/")
+    while True:
+        try:
+            ready = ready_exports(inbox, seen)
+            if ready:
+                ingest_batch(ready, inbox, outdir, **options)
+                # fichiers déplacés : ne plus les attendre
+                for path in ready:
+                    seen.pop(path, None)
+        except Exception as e:
+            # export déplacé ou verrouillé (Finder) en cours de passage, dossier momentanément inaccessible… :
+            # erreur signalée, la surveillance continue (les exports restés dans l'inbox sont repris)
+            print(f"❌ Passage interrompu : {e}", file=sys.stderr)
+            if once:
+                raise
+        if once and not seen:
+            return
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Surveille un dossier de dépôt et fusionne les exports Packshot.")
+    parser.add_argument("inbox", help="dossier surveillé (les exports traités sont rangés dans traites/)")
+    parser.add_argument("--outdir", default="fichier-clean")
+    parser.add_argument("--interval", type=float, default=10.0, help="secondes entre deux passages")
+    parser.add_argument("--once", action="store_true", help="traiter les exports présents puis s'arrêter")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--keep-snapshots", type=int, default=None, metavar="N")
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+    try:
+        watch(args.inbox, args.outdir, args.interval, once=args.once, backend=args.backend,
+              keep_snapshots=args.keep_snapshots, stream=args.stream)
+    except KeyboardInterrupt:
+        print("👋 Surveillance arrêtée.")
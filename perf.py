@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+import contextlib
+from collections import deque
+from datetime import datetime
+
+# Instrumentation optionnelle (désactivée par défaut : aucun coût hors d'un appel de fonction).
+# Activation : variable d'environnement PACKSHOT_PERF=1, `traitement.py --perf`, ou `?perf=1` dans le dashboard
+# (pour la session du navigateur seulement). Pic mémoire en plus, sur demande explicite : PACKSHOT_PERF_MEMORY=1,
+# `--perf-memory`, `?perf=mem` ; tracemalloc n'est actif que pendant une mesure (arrêté en fin de run/de bloc).
+# Chaque étape produit un enregistrement {ts, source, run, stage, seconds, rows_in, rows_out, peak_mb}
+# (peak_mb : pic d'allocation au-delà de la mémoire déjà occupée à l'entrée, None sans mesure mémoire),
+# ajouté en JSON lines à traitement.log par flush() et gardé en mémoire pour le panneau « Performance ».
+ENV_VAR = "PACKSHOT_PERF"
+MEMORY_ENV_VAR = "PACKSHOT_PERF_MEMORY"
+RECENT_MAX = 500
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+def new_state(enabled: bool = False, memory: bool = False, source: str = "traitement") -> dict:
+    """État de mesure (activation, run en cours, sections) : un par processus, ou un par session du dashboard."""
+    return {
+        "enabled": enabled,
+        "memory": memory,
+        "source": source,
+        "run": None,
+        "pending": [],
+        "recent": deque(maxlen=RECENT_MAX),
+        "stack": [],
+        "lap": None,
+        "tracing": False,
+    }
+
+_state = new_state(_env_flag(ENV_VAR) or _env_flag(MEMORY_ENV_VAR), _env_flag(MEMORY_ENV_VAR))
+_session = None  # dashboard : fonction renvoyant l'état de la session courante (None hors session)
+
+# tracemalloc est global au processus : démarré au premier utilisateur, arrêté au dernier
+_tracers = 0
+_tracers_lock = threading.Lock()
+
+def use_session_state(getter) -> None:
+    """Dashboard : activation et sections propres à chaque session, lues via getter() (st.session_state)."""
+    global _session
+    _session = getter
+
+def _current() -> dict:
+    state = _session() if _session is not None else None
+    return _state if state is None else state
+
+def session_state(source: str = "app") -> dict:
+    """État d'une nouvelle session : activation par défaut du processus (variables d'environnement)."""
+    return new_state(_state["enabled"], _state["memory"], source)
+
+def enabled() -> bool:
+    return _current()["enabled"]
+
+def tracks_memory() -> bool:
+    return _current()["enabled"] and _current()["memory"]
+
+def enable(flag: bool = True, memory: bool = False) -> None:
+    state = _current()
+    state["enabled"] = flag
+    state["memory"] = flag and memory
+
+def _acquire_tracing() -> None:
+    global _tracers
+    with _tracers_lock:
+        _tracers += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+def _release_tracing() -> None:
+    global _tracers
+    with _tracers_lock:
+        _tracers = max(_tracers - 1, 0)
+        if _tracers == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+def _memory(state: dict) -> tuple[int, int]:
+    if not state["memory"] or not tracemalloc.is_tracing():
+        return 0, 0
+    return tracemalloc.get_traced_memory()
+
+def _reset_peak(state: dict) -> None:
+    if state["memory"] and tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+def _record(state: dict, stage: str, seconds: float, peak: int, rows_in=None, rows_out=None, **extra) -> dict:
+    rec = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "source": state["source"],
+        "run": state["run"],
+        "stage": stage,
+        "seconds": round(seconds, 6),
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "peak_mb": round(max(peak, 0) / 2**20, 3) if state["memory"] else None,
+        **extra,
+    }
+    state["pending"].append(rec)
+    state["recent"].append(rec)
+    return rec
+
+def _parent(state: dict) -> dict | None:
+    # bloc englobant : stage en cours, sinon section de lap()
+    return state["stack"][-1] if state["stack"] else state["lap"]
+
+def begin(source: str) -> str | None:
+    """Démarre un run (un passage de traitement.py, un rerun du dashboard) ; le clore par end()."""
+    state = _current()
+    if not state["enabled"]:
+        return None
+    if state["memory"] and not state["tracing"]:
+        _acquire_tracing()
+        state["tracing"] = True
+    state["source"] = source
+    state["run"] = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    current, _ = _memory(state)
+    _reset_peak(state)
+    state["lap"] = {"t": time.perf_counter(), "mem": current, "peak": 0}
+    return state["run"]
+
+def end() -> None:
+    """Clôt le run : plus de section ouverte, tracemalloc libéré (arrêté s'il n'est plus utilisé)."""
+    state = _current()
+    state["lap"] = None
+    if state["tracing"]:
+        state["tracing"] = False
+        _release_tracing()
+
+@contextlib.contextmanager
+def stage(name: str, rows_in=None):
+    """Mesure un bloc ; renseigner rec["rows_out"] dans le bloc si utile."""
+    state = _current()
+    if not state["enabled"]:
+        yield {}
+        return
+    if state["memory"]:
+        # hors run (rerun partiel d'un fragment) : traçage le temps du bloc seulement
+        _acquire_tracing()
+    current, peak = _memory(state)
+    parent = _parent(state)
+    if parent is not None:
+        # le pic courant appartient au bloc parent avant remise à zéro
+        parent["peak"] = max(parent["peak"], peak)
+    _reset_peak(state)
+    frame = {"peak": 0, "mem": current}
+    state["stack"].append(frame)
+    rec = {"rows_out": None}
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        seconds = time.perf_counter() - t0
+        state["stack"].pop()
+        peak = max(frame["peak"], _memory(state)[1])
+        parent = _parent(state)
+        if parent is not None:
+            parent["peak"] = max(parent["peak"], peak)
+        _record(state, name, seconds, peak - frame["mem"], rows_in, rec.get("rows_out"))
+        if state["memory"]:
+            _release_tracing()
+
+def lap(name: str, rows_in=None, rows_out=None) -> None:
+    """Clôt la section commencée au lap précédent (ou à begin) : scripts linéaires comme app.py."""
+    state = _current()
+    if not state["enabled"] or state["lap"] is None:
+        return
+    current, peak = _memory(state)
+    section = state["lap"]
+    _record(state, name, time.perf_counter() - section["t"], max(section["peak"], peak) - section["mem"], rows_in, rows_out)
+    _reset_peak(state)
+    state["lap"] = {"t": time.perf_counter(), "mem": current, "peak": 0}
+
+def flush(log_path: str) -> int:
+    """Ajoute les enregistrements en attente à log_path (JSON lines) ; renvoie leur nombre."""
+    state = _current()
+    pending, state["pending"] = state["pending"], []
+    if not pending:
+        return 0
+    folder = os.path.dirname(log_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as lg:
+        for rec in pending:
+            lg.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    return len(pending)
+
+def recent(source: str | None = None) -> list:
+    return [r for r in _current()["recent"] if source is None or r["source"] == source]
+
+def read_log(log_path: str, limit: int = 1000) -> list:
+    """Derniers enregistrements JSON de traitement.log (les lignes texte du journal sont ignorées)."""
+    if not os.path.exists(log_path):
+        return []
+    out = []
+    with open(log_path, encoding="utf-8") as lg:
+        for line in deque(lg, maxlen=limit * 2):
+            if line.startswith("{"):
+                try:
+                    out.append(json.loads(line))
+                except ValueError:
+                    continue
+    return out[-limit:]
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+# Index temporel : tables triées par "Date de sortie" (index 0..n-1), une période = une tranche
+# contiguë trouvée par recherche dichotomique (searchsorted), sans masque ni copie.
+
+def sort_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None:
+        return None
+    return df.sort_values("Date de sortie", kind="stable").reset_index(drop=True)
+
+def _to_datetime64(value) -> np.datetime64:
+    return pd.Timestamp(value).to_datetime64()
+
+def positions(df: pd.DataFrame, start=None, end=None, end_inclusive: bool = True) -> tuple[int, int]:
+    """Bornes [i, j) des lignes datées de start à end (df trié par date)."""
+    dates = df["Date de sortie"].to_numpy()
+    i = 0 if start is None else int(dates.searchsorted(_to_datetime64(start), side="left"))
+    if end is None:
+        return i, len(dates)
+    j = int(dates.searchsorted(_to_datetime64(end), side="right" if end_inclusive else "left"))
+    return i, max(i, j)
+
+def period_rows(df: pd.DataFrame, start, end) -> pd.DataFrame:
+    """Lignes de [start, end] (bornes incluses) : vue sur df trié, pas de copie."""
+    i, j = positions(df, start, end)
+    return df.iloc[i:j]
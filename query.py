@@ -0,0 +1,129 @@
+import sys
+import argparse
+
+# Requêtes en ligne de commande sur fichier-clean/, sans Streamlit ni plotly : tops, timeline mensuelle,
+# comparaison de deux périodes et plus fortes progressions ; mêmes règles de comptage que le dashboard,
+# sortie CSV ou JSON.
+# pandas, pyarrow et les modules du pipeline ne sont importés qu'au moment de répondre (--help immédiat).
+#   python query.py top Production -n 20 --from 2024-01-01 --to "30 juin 2024"
+#   python query.py compare Agence --a 2023-01-01 2023-12-31 --b 2024-01-01 2024-12-31 --format json
+DATA_DIR = "fichier-clean"
+DIMENSIONS = ["Client", "Agence", "Production", "Réalisateur"]  # cube.DIMENSIONS
+GRANULARITES = ["campagnes", "films"]
+RANK_BY = {"delta": "Δ", "croissance": "Croissance (%)"}  # option --by -> critère de trends.rising
+
+def parse_date(value: str | None):
+    """Date de la ligne de commande (ISO ou française : "17 mai 2024") ; None si absente."""
+    if value is None:
+        return None
+    import pandas as pd
+    from dates_fr import normalize_date_string
+    ts = pd.to_datetime(normalize_date_string(value), errors="coerce", dayfirst=True, format="mixed")
+    if pd.isna(ts):
+        raise ValueError(f"Date illisible : {value}")
+    return ts
+
+def top(dataset: dict, colname: str, granularite: str, start, end, n: int):
+    """Top n de colname sur [start, end] (bornes absentes : tout l'historique)."""
+    import compare
+    import periods
+    from views import top_df, top_director_by_campaigns
+    rows = periods.period_rows(compare.work_table(dataset["views"], granularite), start, end)
+    if colname == "Réalisateur" and granularite == "campagnes":
+        return top_director_by_campaigns(rows, n, dataset["bridge"])
+    return top_df(rows, colname, n)
+
+def timeline(dataset: dict, granularite: str, start, end):
+    """Nombre de campagnes (ou films) par mois sur [start, end]."""
+    import compare
+    import periods
+    rows = periods.period_rows(compare.work_table(dataset["views"], granularite), start, end)
+    mois = rows["Date de sortie"].dt.strftime("%Y-%m")
+    return mois.value_counts().sort_index().rename_axis("Mois").reset_index(name="Nombre")
+
+def compare_periods(dataset: dict, colname: str, granularite: str, period_a, period_b, n: int):
+    """Top n de la période B face à la période A (table du mode comparaison du dashboard)."""
+    import compare
+    counts_a, counts_b = (
+        compare.period_counts(dataset["views"], dataset["cube"], colname, granularite, start, end, dataset["bridge"])
+        for start, end in (period_a, period_b)
+    )
+    return compare.compare_table(counts_a, counts_b, n)
+
+def rising(dataset: dict, colname: str, granularite: str, window: int, end, n: int, by: str):
+    """Plus fortes progressions sur deux fenêtres consécutives de `window` mois se terminant au mois de end."""
+    import trends
+    matrix = trends.month_matrix(dataset["cube"], colname, granularite)
+    if matrix is None:
+        raise ValueError(f"Aucune donnée pour {colname}.")
+    return trends.rising(matrix, window, end, n=n, by=by)
+
+def write_result(df, fmt: str, out) -> None:
+    if fmt == "json":
+        out.write(df.to_json(orient="records", force_ascii=False, date_format="iso", indent=1))
+        out.write("\n")
+    else:
+        df.to_csv(out, index=False)
+
+def run(args) -> int:
+    import sources
+    dataset = sources.load_dataset(args.data_dir, with_cube=args.cmd in ("compare", "rising"))
+    if dataset is None:
+        print(f"❌ Aucune donnée dans {args.data_dir}/ : lancer d'abord traitement.py.", file=sys.stderr)
+        return 1
+    if args.cmd == "top":
+        result = top(dataset, args.dimension, args.gran, parse_date(args.start), parse_date(args.end), args.n)
+    elif args.cmd == "timeline":
+        result = timeline(dataset, args.gran, parse_date(args.start), parse_date(args.end))
+    elif args.cmd == "rising":
+        result = rising(dataset, args.dimension, args.gran, args.window, parse_date(args.end), args.n, RANK_BY[args.by])
+    else:
+        period_a = tuple(parse_date(d) for d in args.a)
+        period_b = tuple(parse_date(d) for d in args.b)
+        result = compare_periods(dataset, args.dimension, args.gran, period_a, period_b, args.n)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write_result(result, args.format, out)
+    else:
+        write_result(result, args.format, sys.stdout)
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Requêtes sur les données nettoyées (tops, timeline, comparaison, progressions).")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--gran", choices=GRANULARITES, default="campagnes", help="unité de comptage")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("--output", help="fichier de sortie (défaut : sortie standard)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_top = sub.add_parser("top", help="top N d'une dimension sur une période")
+    p_top.add_argument("dimension", choices=DIMENSIONS)
+    p_top.add_argument("-n", type=int, default=10)
+    p_top.add_argument("--from", dest="start", help="date de début incluse (défaut : première date)")
+    p_top.add_argument("--to", dest="end", help="date de fin incluse (défaut : dernière date)")
+
+    p_tl = sub.add_parser("timeline", help="répartition mensuelle sur une période")
+    p_tl.add_argument("--from", dest="start")
+    p_tl.add_argument("--to", dest="end")
+
+    p_cmp = sub.add_parser("compare", help="top N de la période B face à la période A")
+    p_cmp.add_argument("dimension", choices=DIMENSIONS)
+    p_cmp.add_argument("-n", type=int, default=10)
+    p_cmp.add_argument("--a", nargs=2, required=True, metavar=("DEBUT", "FIN"))
+    p_cmp.add_argument("--b", nargs=2, required=True, metavar=("DEBUT", "FIN"))
+
+    p_up = sub.add_parser("rising", help="plus fortes progressions entre deux fenêtres de mois consécutives")
+    p_up.add_argument("dimension", choices=DIMENSIONS)
+    p_up.add_argument("-n", type=int, default=10)
+    p_up.add_argument("--window", type=int, default=6, help="taille de chaque fenêtre, en mois")
+    p_up.add_argument("--to", dest="end", help="mois de fin de la fenêtre récente (défaut : dernier mois)")
+    p_up.add_argument("--by", choices=list(RANK_BY), default="delta",
+                      help="critère de classement : écart (delta) ou taux de croissance (croissance)")
+    args = parser.parse_args()
+
+    try:
+        raise SystemExit(run(args))
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        raise SystemExit(1)
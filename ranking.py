@@ -0,0 +1,14 @@
+import pandas as pd
+
+# Classement « top N » commun aux tops calculés sur les lignes (views) et sur le cube (cube, cross_index).
+# Module feuille : importé par views et cube sans dépendance circulaire.
+
+def top_from_counts(counts: pd.Series, label_col: str, n: int) -> pd.DataFrame:
+    """Top n (Rang, label_col, Nombre) d'une série de comptes indexée par valeur.
+
+    Égalités départagées par ordre alphabétique ; les comptes nuls (modalités absentes d'une colonne
+    catégorielle) sont écartés."""
+    s = counts[counts > 0].rename_axis(label_col).reset_index(name="Nombre")
+    s = s.sort_values(["Nombre", label_col], ascending=[False, True], kind="stable").reset_index(drop=True)
+    s.insert(0, "Rang", range(1, len(s) + 1))
+    return s.head(n)
@@ -0,0 +1,195 @@
+import os
+import re
+import argparse
+import numpy as np
+import pandas as pd
+
+import compare
+import cross_index
+import cube
+import periods
+from cube import DIMENSIONS
+from ranking import top_from_counts
+
+# Rapport d'une période : tops, timeline mensuelle, analyses croisées des entités les plus présentes
+# et comparaison A/B, en un classeur XLSX écrit en flux (openpyxl write_only, mémoire constante)
+# ou en CSV (un fichier par feuille). Les tables viennent des agrégats du dashboard (cube indexé,
+# index croisé) : seuls les mois partiels sont recomptés depuis les lignes.
+#   python report.py --from 2025-01-01 --to 2025-03-31 --output rapport_T1.xlsx
+#   python report.py --monthly --outdir rapports/
+TIMELINE_SHEET = "Timeline"
+COMPARE_SHEET = "Comparaison"
+
+def previous_period(start, end) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """Période de même durée juste avant [start, end] (bornes incluses, au jour)."""
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    length = end - start + pd.Timedelta(days=1)
+    return start - length, start - pd.Timedelta(days=1)
+
+def build_indexes(views: dict, granularite: str, bridge: pd.DataFrame | None = None) -> dict:
+    """Index croisé de la table de travail (à construire une fois pour une série de rapports)."""
+    work = compare.work_table(views, granularite)
+    return cross_index.build_cross_index(work, granularite, bridge if granularite == "campagnes" else None)
+
+def _top_entities(cross_idx: dict, dim: str, in_period: slice, k: int) -> list:
+    # entités les plus présentes sur la période (lignes de la table de travail), ex aequo par ordre alphabétique
+    codes = cross_idx["codes"][dim][in_period]
+    counts = np.bincount(codes[codes >= 0], minlength=len(cross_idx["values"][dim]))
+    order = np.lexsort((np.arange(len(counts)), -counts))[:k]
+    return list(cross_idx["values"][dim][order[counts[order] > 0]])
+
+def report_tables(views: dict, cube_idx: dict, cross_idx: dict, granularite: str, start, end,
+                  n: int = 10, cross_n: int = 3, period_a=None, bridge: pd.DataFrame | None = None) -> dict:
+    """Feuilles du rapport {nom: DataFrame}, dans l'ordre du classeur.
+
+    period_a : période A de la comparaison (B = [start, end]) ; par défaut la période précédente de même durée."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    a_start, a_end = (pd.Timestamp(d) for d in period_a) if period_a is not None else previous_period(start, end)
+    work = compare.work_table(views, granularite)
+    bounds = (work["Date de sortie"].iloc[0], work["Date de sortie"].iloc[-1]) if len(work) else None
+    work_bridge = bridge if granularite == "campagnes" else None
+    i, j = periods.positions(work, start, end)
+
+    tables = {"Résumé": pd.DataFrame({
+        "Paramètre": ["Période", "Granularité", "Éléments", "Comparée à (période A)"],
+        "Valeur": [f"{start:%d/%m/%Y} → {end:%d/%m/%Y}", granularite, j - i,
+                   f"{a_start:%d/%m/%Y} → {a_end:%d/%m/%Y}"],
+    })}
+    for dim in DIMENSIONS:
+        counts = cube.counts_between(cube_idx, dim, granularite, start, end, rows=work, bounds=bounds, bridge=work_bridge)
+        tables[f"Top {dim}"] = top_from_counts(counts, dim, n)
+
+    timeline = cube.timeline_between(cube_idx, granularite, start, end, rows=work, bounds=bounds)
+    tables[TIMELINE_SHEET] = timeline.assign(Mois=timeline["Mois"].dt.strftime("%Y-%m"))
+
+    in_period = slice(i, j)
+    for dim in DIMENSIONS:
+        parts = []
+        for value in _top_entities(cross_idx, dim, in_period, cross_n):
+            for other in DIMENSIONS:
+                if other == dim:
+                    continue
+                top = cross_index.cross_top(cross_idx, work, dim, value, other, n, in_period)
+                parts.append(top.rename(columns={other: "Nom"}).assign(**{dim: value, "Dimension": other}))
+        columns = [dim, "Dimension", "Rang", "Nom", "Nombre"]
+        tables[f"Croisé {dim}"] = pd.concat(parts, ignore_index=True)[columns] if parts else pd.DataFrame(columns=columns)
+
+    parts = []
+    for dim in DIMENSIONS:
+        comp = compare.compare_table(
+            compare.period_counts(views, cube_idx, dim, granularite, a_start, a_end, bridge),
+            compare.period_counts(views, cube_idx, dim, granularite, start, end, bridge), n)
+        comp.insert(0, "Dimension", dim)
+        parts.append(comp)
+    tables[COMPARE_SHEET] = pd.concat(parts, ignore_index=True)
+    return tables
+
+# -------------------- Écriture --------------------
+def _cell(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def write_xlsx(tables: dict, target) -> None:
+    """Classeur en flux (write_only) : lignes écrites au fil de l'eau. target : chemin ou fichier binaire."""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for name, df in tables.items():
+        ws = wb.create_sheet(title=name[:31])
+        ws.append([str(c) for c in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_cell(v) for v in row])
+    if not isinstance(target, str):
+        wb.save(target)
+        return
+    tmp = target + ".tmp"
+    wb.save(tmp)
+    os.replace(tmp, target)
+
+def _slug(name: str) -> str:
+    return re.sub(r"\W+", "_", name.lower()).strip("_")
+
+def write_csv(tables: dict, folder: str) -> list[str]:
+    """Un CSV par feuille dans folder (écritures atomiques)."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for k, (name, df) in enumerate(tables.items(), start=1):
+        path = os.path.join(folder, f"{k:02d}_{_slug(name)}.csv")
+        df.to_csv(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        paths.append(path)
+    return paths
+
+def write_csv_zip(tables: dict, target) -> None:
+    """Les CSV de write_csv dans une archive zip (téléchargement depuis le dashboard)."""
+    import zipfile
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for k, (name, df) in enumerate(tables.items(), start=1):
+            zf.writestr(f"{k:02d}_{_slug(name)}.csv", df.to_csv(index=False))
+
+def write_report(tables: dict, path: str, fmt: str = "xlsx") -> str:
+    if fmt == "csv":
+        write_csv(tables, path)
+    else:
+        write_xlsx(tables, path)
+    return path
+
+def monthly_reports(views: dict, cube_idx: dict, cross_idx: dict, granularite: str, outdir: str,
+                    n: int = 10, cross_n: int = 3, fmt: str = "xlsx", bridge: pd.DataFrame | None = None):
+    """Un rapport par mois de l'historique (comparé au mois précédent), agrégats et index partagés ;
+    renvoie les chemins écrits."""
+    work = compare.work_table(views, granularite)
+    if work.empty:
+        return []
+    os.makedirs(outdir, exist_ok=True)
+    written = []
+    months = pd.period_range(work["Date de sortie"].iloc[0], work["Date de sortie"].iloc[-1], freq="M")
+    for month in months:
+        start, end = month.start_time, month.end_time.normalize()
+        prev = month - 1
+        tables = report_tables(views, cube_idx, cross_idx, granularite, start, end, n=n, cross_n=cross_n,
+                               period_a=(prev.start_time, prev.end_time.normalize()), bridge=bridge)
+        name = f"rapport_{month.strftime('%Y-%m')}" + (".xlsx" if fmt == "xlsx" else "")
+        written.append(write_report(tables, os.path.join(outdir, name), fmt))
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rapport (tops, timeline, analyses croisées, comparaison) d'une période.")
+    parser.add_argument("--data-dir", default="fichier-clean")
+    parser.add_argument("--gran", choices=["campagnes", "films"], default="campagnes", help="unité de comptage")
+    parser.add_argument("-n", type=int, default=10, help="taille des tops")
+    parser.add_argument("--cross-n", type=int, default=3, help="entités détaillées par analyse croisée")
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--from", dest="start", help="début de la période (défaut : première date)")
+    parser.add_argument("--to", dest="end", help="fin de la période (défaut : dernière date)")
+    parser.add_argument("--a", nargs=2, metavar=("DEBUT", "FIN"),
+                        help="période A de la comparaison (défaut : période précédente de même durée)")
+    parser.add_argument("--output", help="classeur (ou dossier en CSV) à écrire (défaut : rapport_DEBUT_FIN)")
+    parser.add_argument("--monthly", action="store_true", help="un rapport par mois sur tout l'historique")
+    parser.add_argument("--outdir", default="rapports", help="dossier des rapports mensuels")
+    args = parser.parse_args()
+
+    import sources
+    from query import parse_date
+    dataset = sources.load_dataset(args.data_dir, with_cube=True)
+    if dataset is None:
+        raise SystemExit(f"❌ Aucune donnée dans {args.data_dir}/ : lancer d'abord traitement.py.")
+    views, bridge = dataset["views"], dataset["bridge"]
+    cross_idx = build_indexes(views, args.gran, bridge)
+
+    if args.monthly:
+        paths = monthly_reports(views, dataset["cube"], cross_idx, args.gran, args.outdir, n=args.n,
+                                cross_n=args.cross_n, fmt=args.format, bridge=bridge)
+        print(f"✅ {len(paths)} rapports mensuels écrits dans {args.outdir}/")
+        raise SystemExit(0)
+
+    work = compare.work_table(views, args.gran)
+    start = parse_date(args.start) or work["Date de sortie"].iloc[0]
+    end = parse_date(args.end) or work["Date de sortie"].iloc[-1]
+    period_a = tuple(parse_date(d) for d in args.a) if args.a else None
+    tables = report_tables(views, dataset["cube"], cross_idx, args.gran, start, end, n=args.n,
+                           cross_n=args.cross_n, period_a=period_a, bridge=bridge)
+    output = args.output or f"rapport_{start:%Y-%m-%d}_{end:%Y-%m-%d}" + (".xlsx" if args.format == "xlsx" else "")
+    print(f"✅ Rapport écrit : {write_report(tables, output, args.format)}")
@@ -0,0 +1,405 @@
+import os
+import io
+import csv
+import gzip
+import json
+import hashlib
+import argparse
+import itertools
+import tempfile
+from collections import Counter
+import pandas as pd
+
+import store
+
+# Instantanés différentiels : chaque exécution n'enregistre que les lignes ajoutées / retirées
+# (une ligne modifiée = retrait de l'ancienne version + ajout de la nouvelle), dans des objets
+# gzip adressés par contenu. Le manifeste permet de rejouer l'historique jusqu'à n'importe quel run.
+SNAPSHOT_DIR = "snapshots"
+TABLES = ("films", "campagnes")
+
+def _snap_dir(outdir: str) -> str:
+    return os.path.join(outdir, SNAPSHOT_DIR)
+
+def _objects_dir(outdir: str) -> str:
+    return os.path.join(_snap_dir(outdir), "objects")
+
+def _manifest_path(outdir: str, backend: str) -> str:
+    return os.path.join(_snap_dir(outdir), f"manifest_{backend}.json")
+
+def load_manifest(outdir: str, backend: str = "csv") -> dict:
+    path = _manifest_path(outdir, backend)
+    if not os.path.exists(path):
+        return {"backend": backend, "base": {}, "runs": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(outdir: str, backend: str, manifest: dict) -> None:
+    path = _manifest_path(outdir, backend)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+# -------------------- Lignes / objets --------------------
+def _rows_to_bytes(rows) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+def _put_rows(outdir: str, rows, batch: int = 10_000) -> tuple[str | None, int, int]:
+    """Écrit un objet en flux depuis un itérable de lignes : (sha, nombre de lignes, somme des empreintes).
+
+    Même contenu que _put_object (sha des lignes CSV non compressées) sans garder les lignes en mémoire."""
+    os.makedirs(_objects_dir(outdir), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=_objects_dir(outdir), suffix=".tmp")
+    h, n, hashes = hashlib.sha256(), 0, 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # mtime=0 : même contenu -> même fichier ; niveau 6 : deux fois plus rapide que 9, taille quasi identique
+            with gzip.GzipFile(fileobj=f, mode="wb", mtime=0, compresslevel=6) as gz:
+                it = iter(rows)
+                while part := list(itertools.islice(it, batch)):
+                    data = _rows_to_bytes(part)
+                    h.update(data)
+                    gz.write(data)
+                    n += len(part)
+                    hashes += sum(_row_hash(r) for r in part)
+        if n == 0:
+            return None, 0, 0
+        path = os.path.join(_objects_dir(outdir), f"{h.hexdigest()}.csv.gz")
+        if not os.path.exists(path):
+            os.replace(tmp, path)
+        return h.hexdigest(), n, hashes
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _put_object(outdir: str, rows) -> str | None:
+    return _put_rows(outdir, rows)[0]
+
+def _get_object(outdir: str, sha: str | None) -> list[tuple]:
+    if sha is None:
+        return []
+    with gzip.open(os.path.join(_objects_dir(outdir), f"{sha}.csv.gz"), "rt", encoding="utf-8", newline="") as f:
+        return [tuple(r) for r in csv.reader(f)]
+
+def _row_hash(row) -> int:
+    return int.from_bytes(hashlib.sha256("\x1f".join(row).encode("utf-8")).digest()[:8], "big")
+
+def _digest_of(hashes: int) -> str:
+    return f"{hashes % (1 << 64):016x}"
+
+def digest(rows) -> str:
+    # empreinte indépendante de l'ordre (multi-ensemble de lignes)
+    return _digest_of(sum(_row_hash(r) for r in rows))
+
+def read_csv_text(path: str) -> pd.DataFrame | None:
+    # lignes telles qu'écrites (champs texte, vides = "") : base des deltas d'un CSV
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_csv(path, dtype=str, keep_default_na=False, na_filter=False)
+    except pd.errors.EmptyDataError:
+        return None
+
+def read_previous(path: str) -> tuple[pd.DataFrame, str] | None:
+    """État d'un CSV avant sa réécriture : (lignes texte, sha du fichier)."""
+    frame = read_csv_text(path)
+    return None if frame is None else (frame, file_sha(path))
+
+def file_sha(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def remap_rows(rows, old_header: list[str], new_header: list[str]) -> list[tuple]:
+    # projette des lignes sur un nouvel en-tête (colonnes absentes -> "")
+    if list(old_header) == list(new_header):
+        return list(rows)
+    pos = {c: i for i, c in enumerate(old_header)}
+    idx = [pos.get(c) for c in new_header]
+    return [tuple("" if i is None else r[i] for i in idx) for r in rows]
+
+def _frame_rows(frame: pd.DataFrame):
+    return frame.itertuples(index=False, name=None)
+
+def _row_keys(frame: pd.DataFrame) -> pd.MultiIndex:
+    # (empreinte vectorisée de la ligne, rang parmi ses doublons) : multi-ensemble comparable par isin
+    h = pd.util.hash_pandas_object(frame, index=False)
+    return pd.MultiIndex.from_arrays([h.to_numpy(), h.groupby(h).cumcount().to_numpy()])
+
+def diff_frames(old: pd.DataFrame, new: pd.DataFrame):
+    """Comme diff_rows sur des lignes texte en DataFrame (mêmes colonnes) : (ajoutées, retirées) en flux."""
+    old_keys, new_keys = _row_keys(old), _row_keys(new)
+    return _frame_rows(new[~new_keys.isin(old_keys)]), _frame_rows(old[~old_keys.isin(new_keys)])
+
+def diff_rows(old_rows, new_rows) -> tuple[list[tuple], list[tuple]]:
+    old_c, new_c = Counter(old_rows), Counter(new_rows)
+    added = list((new_c - old_c).elements())
+    removed = list((old_c - new_c).elements())
+    return added, removed
+
+# -------------------- Tri canonique --------------------
+def sort_columns(columns, table: str) -> list[str]:
+    keys = [k for k in store.TABLE_KEYS[table] if k != "Date de sortie"]
+    return [c for c in ["Date de sortie"] + keys if c in columns]
+
+def canonical_sort(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    # ordre total (date puis clé) : permet de reconstruire un fichier identique à l'octet près
+    cols = sort_columns(df.columns, table)
+    if not cols:
+        return df
+    # "" et NaN confondus (indiscernables une fois écrits) : même ordre que celui rejoué depuis le texte
+    keys = df[cols].mask(df[cols].eq("")).reset_index(drop=True)
+    return df.iloc[keys.sort_values(cols, kind="stable", na_position="last").index]
+
+def _sorted_text_rows(header: list[str], rows, table: str) -> list[tuple]:
+    if not rows:
+        return []
+    frame = pd.DataFrame(rows, columns=header, dtype=object)
+    keys = frame[sort_columns(header, table)].mask(lambda k: k.eq(""))
+    order = canonical_sort(keys, table).index
+    return [rows[i] for i in order]
+
+# -------------------- Historique --------------------
+def state(outdir: str, table: str, run_id: str | None = None, backend: str = "csv",
+          manifest: dict | None = None) -> tuple[list[str], list[tuple]]:
+    """Rejoue base + deltas jusqu'au run demandé (dernier run par défaut)."""
+    manifest = manifest or load_manifest(outdir, backend)
+    base = manifest["base"].get(table)
+    if base is None:
+        return [], []
+    header = base["header"]
+    current = Counter(_get_object(outdir, base["rows"]))
+    if run_id is not None and run_id == manifest.get("base_id"):
+        return header, list(current.elements())
+    if run_id is not None and run_id not in {r["id"] for r in manifest["runs"]}:
+        raise ValueError(f"Instantané introuvable : {run_id}")
+    for run in manifest["runs"]:
+        entry = run["tables"].get(table)
+        if entry is not None:
+            if entry["header"] != header:
+                current = Counter(remap_rows(list(current.elements()), header, entry["header"]))
+                header = entry["header"]
+            current.subtract(Counter(_get_object(outdir, entry["removed"])))
+            current.update(Counter(_get_object(outdir, entry["added"])))
+            current = +current
+        if run["id"] == run_id:
+            break
+    return header, list(current.elements())
+
+def _last_entry(manifest: dict, table: str) -> dict | None:
+    for run in reversed(manifest["runs"]):
+        if table in run["tables"]:
+            return run["tables"][table]
+    return manifest["base"].get(table)
+
+def record_run(outdir: str, backend: str, ts: str, tables: dict, label: str = "merge",
+               base: dict | None = None) -> str:
+    """Ajoute un run au manifeste.
+
+    tables : {table: {"header", "added", "removed", "rows", ["sha"], ["digest"]}}
+    base   : {table: (header, rows)} état avant le tout premier run (si pas encore de base)
+    Les lignes (added, removed, base) peuvent être des itérables : elles sont écrites en flux.
+    """
+    manifest = load_manifest(outdir, backend)
+    for table, (header, rows) in (base or {}).items():
+        if table not in manifest["base"]:
+            sha, n, hashes = _put_rows(outdir, rows)
+            manifest["base"][table] = {"header": header, "rows": sha, "n_rows": n, "digest": _digest_of(hashes)}
+    run_id = f"{len(manifest['runs']) + manifest.get('compacted', 0) + 1:04d}"
+    entry_tables = {}
+    for table, t in tables.items():
+        prev = _last_entry(manifest, table)
+        added, n_added, h_added = _put_rows(outdir, t["added"])
+        removed, n_removed, h_removed = _put_rows(outdir, t["removed"])
+        if t.get("digest"):
+            new_digest = t["digest"]
+        elif prev is not None and prev["header"] != t["header"]:
+            # en-tête modifié : les lignes précédentes ont été reprojetées, empreinte recalculée
+            header, rows = state(outdir, table, manifest=manifest)
+            _, rows = diff_rows(remap_rows(rows, header, t["header"]) + _get_object(outdir, added),
+                                _get_object(outdir, removed))
+            new_digest = digest(rows)
+        else:
+            prev_digest = int(prev["digest"], 16) if prev else 0
+            new_digest = _digest_of(prev_digest + h_added - h_removed)
+        entry = {
+            "header": t["header"],
+            "added": added,
+            "removed": removed,
+            "n_added": n_added,
+            "n_removed": n_removed,
+            "rows": t["rows"],
+            "digest": new_digest,
+        }
+        if t.get("sha"):
+            entry["sha"] = t["sha"]
+        entry_tables[table] = entry
+    manifest["runs"].append({"id": run_id, "ts": ts, "label": label, "tables": entry_tables})
+    _save_manifest(outdir, backend, manifest)
+    return run_id
+
+def record_csv_run(outdir: str, previous: dict, ts: str, label: str = "merge") -> str:
+    """Enregistre le delta entre les CSV précédents (previous[table] = read_previous(...) ou None)
+    et les CSV qui viennent d'être écrits ; l'empreinte suit par somme des lignes ajoutées / retirées."""
+    manifest = load_manifest(outdir, "csv")
+    tables, base = {}, {}
+    for table in TABLES:
+        path = os.path.join(outdir, f"{table}.csv")
+        new = read_csv_text(path)
+        if new is None:
+            continue
+        header = list(new.columns)
+        old, old_sha = previous.get(table) or (new.iloc[:0], None)
+        prev_entry = _last_entry(manifest, table)
+        if prev_entry is None:
+            base[table] = (list(old.columns), _frame_rows(old))
+        elif prev_entry.get("sha") != old_sha:
+            # fichier modifié hors traitement : on repart de l'état connu de l'historique
+            old_header, old_rows = state(outdir, table, manifest=manifest)
+            old = pd.DataFrame(old_rows, columns=old_header, dtype=object)
+        added, removed = diff_frames(old.reindex(columns=header, fill_value=""), new)
+        tables[table] = {"header": header, "added": added, "removed": removed,
+                         "rows": len(new), "sha": file_sha(path)}
+    return record_run(outdir, "csv", ts, tables, label=label, base=base)
+
+def _write_csv(path: str, header: list[str], rows, table: str) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(header)
+        w.writerows(_sorted_text_rows(header, rows, table))
+
+def rollback(outdir: str, run_id: str, backend: str = "csv", ts: str = "") -> None:
+    """Restaure films/campagnes dans l'état exact du run demandé, ou de la base après compactage
+    (base_id) ; l'opération est elle-même tracée."""
+    manifest = load_manifest(outdir, backend)
+    if run_id != manifest.get("base_id") and all(r["id"] != run_id for r in manifest["runs"]):
+        raise ValueError(f"Instantané introuvable : {run_id}")
+    tables, restored, staged = {}, {}, {}
+    try:
+        for table in TABLES:
+            if table not in manifest["base"]:
+                continue
+            header, rows = state(outdir, table, run_id, backend, manifest)
+            cur_header, cur_rows = state(outdir, table, None, backend, manifest)
+            restored[table] = (header, rows)
+            added, removed = diff_rows(remap_rows(cur_rows, cur_header, header), rows)
+            tables[table] = {"header": header, "added": added, "removed": removed,
+                             "rows": len(rows), "digest": digest(rows)}
+            if backend == "csv":
+                # fichier restauré écrit à côté, vérifié, puis substitué : l'original reste intact en cas d'écart
+                tmp = os.path.join(outdir, f"{table}.csv.tmp")
+                staged[table] = tmp
+                _write_csv(tmp, header, rows, table)
+                sha = file_sha(tmp)
+                target = _entry_upto(manifest, table, run_id)
+                if target and target.get("sha") and target["sha"] != sha:
+                    raise RuntimeError(f"Restauration de {table}.csv : empreinte différente de l'original.")
+                tables[table]["sha"] = sha
+        if backend == "csv":
+            for table, tmp in staged.items():
+                os.replace(tmp, os.path.join(outdir, f"{table}.csv"))
+        else:
+            conn = store.connect(store.store_path(outdir))
+            try:
+                with conn:
+                    for table, (header, rows) in restored.items():
+                        store.replace_table(conn, table, header, rows)
+            finally:
+                conn.close()
+    finally:
+        for tmp in staged.values():
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    record_run(outdir, backend, ts, tables, label=f"rollback:{run_id}")
+
+def _entry_upto(manifest: dict, table: str, run_id: str) -> dict | None:
+    if run_id == manifest.get("base_id"):
+        return manifest["base"].get(table)
+    found = None
+    for run in manifest["runs"]:
+        if table in run["tables"]:
+            found = run["tables"][table]
+        if run["id"] == run_id:
+            break
+    return found
+
+def compact(outdir: str, keep: int, backend: str = "csv") -> int:
+    """Ne conserve que les `keep` derniers runs : les plus anciens sont fusionnés dans la base.
+    Retourne le nombre de runs supprimés."""
+    manifest = load_manifest(outdir, backend)
+    drop = len(manifest["runs"]) - max(keep, 0)
+    if drop <= 0:
+        return 0
+    last_dropped = manifest["runs"][drop - 1]["id"]
+    for table in TABLES:
+        if table not in manifest["base"]:
+            continue
+        header, rows = state(outdir, table, last_dropped, backend, manifest)
+        manifest["base"][table] = {"header": header, "rows": _put_object(outdir, rows),
+                                   "n_rows": len(rows), "digest": digest(rows)}
+        # sha du fichier à ce run : détection des modifications hors traitement sans relire l'historique
+        sha = (_entry_upto(manifest, table, last_dropped) or {}).get("sha")
+        if sha:
+            manifest["base"][table]["sha"] = sha
+    manifest["runs"] = manifest["runs"][drop:]
+    manifest["compacted"] = manifest.get("compacted", 0) + drop
+    manifest["base_id"] = last_dropped
+    _save_manifest(outdir, backend, manifest)
+    gc(outdir)
+    return drop
+
+def gc(outdir: str) -> int:
+    # supprime les objets qui ne sont plus référencés par aucun manifeste
+    used = set()
+    for backend in ("csv", "sqlite"):
+        manifest = load_manifest(outdir, backend)
+        for b in manifest["base"].values():
+            used.add(b["rows"])
+        for run in manifest["runs"]:
+            for t in run["tables"].values():
+                used.update([t["added"], t["removed"]])
+    removed = 0
+    odir = _objects_dir(outdir)
+    if os.path.isdir(odir):
+        for name in os.listdir(odir):
+            if name.endswith(".csv.gz") and name[:-len(".csv.gz")] not in used:
+                os.remove(os.path.join(odir, name))
+                removed += 1
+    return removed
+
+if __name__ == "__main__":
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Instantanés différentiels de fichier-clean.")
+    parser.add_argument("--outdir", default="fichier-clean")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="lister les runs enregistrés")
+    p_rb = sub.add_parser("rollback", help="restaurer l'état d'un run")
+    p_rb.add_argument("run_id")
+    p_cp = sub.add_parser("compact", help="appliquer la rétention (fusion des anciens runs)")
+    p_cp.add_argument("--keep", type=int, required=True, help="nombre de runs à conserver")
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        manifest = load_manifest(args.outdir, args.backend)
+        for run in manifest["runs"]:
+            detail = ", ".join(f"{t}: +{e['n_added']} -{e['n_removed']} ({e['rows']} lignes)" for t, e in run["tables"].items())
+            print(f"{run['id']}  [{run['ts']}]  {run['label']}  {detail}")
+    else:
+        import ingest
+        # mêmes règles que les fusions : sous verrou de fichier-clean/, puis nouvelle version pour le dashboard
+        with ingest.locked(args.outdir):
+            if args.cmd == "rollback":
+                rollback(args.outdir, args.run_id, args.backend, ts=datetime.now().strftime("%Y-%m-%d_%Hh%M"))
+                version = ingest.bump_version(args.outdir, [f"rollback {args.run_id}"])
+                print(f"✅ Restauration du run {args.run_id} terminée (version {version}).")
+            else:
+                n = compact(args.outdir, args.keep, args.backend)
+                version = ingest.bump_version(args.outdir, [f"compact {args.keep}"])
+                print(f"✅ {n} run(s) fusionné(s) dans la base (version {version}).")
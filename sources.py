@@ -0,0 +1,98 @@
+import os
+import pandas as pd
+
+import columnar
+import cube
+import directors
+import periods
+import store
+from dates_fr import dates_cache_path
+from views import build_views
+
+# Chargement de fichier-clean/ sans Streamlit (dashboard, requêtes en ligne de commande, exports).
+# Préférence : copie colonnaire à jour, sinon la plus récente de la base SQLite et de campagnes.csv, puis films.csv ;
+# cube et table pont ne sont repris que s'ils sont au moins aussi récents que la source.
+
+def file_signature(path: str):
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (path, info.st_mtime_ns, info.st_size)
+
+def data_dir_signature(data_dir: str):
+    names = [store.STORE_NAME, store.STORE_NAME + "-wal", "campagnes.csv", "films.csv"]
+    return tuple(file_signature(os.path.join(data_dir, n)) for n in names)
+
+def is_fresh(derived_signature, *source_signatures) -> bool:
+    """Fichier dérivé présent et au moins aussi récent que chacune des sources présentes."""
+    if derived_signature is None:
+        return False
+    return all(sig is None or sig[1] <= derived_signature[1] for sig in source_signatures)
+
+def _mtime(*paths) -> int | None:
+    times = [sig[1] for sig in map(file_signature, paths) if sig is not None]
+    return max(times) if times else None
+
+def load_clean(data_dir: str):
+    """(table brute, nom du fichier source) ; (None, None) si fichier-clean/ est vide."""
+    # base SQLite (traitement.py --backend sqlite) seulement si elle est la dernière écrite :
+    # un passage ultérieur en CSV (backend par défaut) ne met pas la base à jour
+    f_store = store.store_path(data_dir)
+    store_mtime = _mtime(f_store, f_store + "-wal")
+    csv_mtime = _mtime(*(os.path.join(data_dir, n) for n in ("campagnes.csv", "films.csv")))
+    if store_mtime is not None and (csv_mtime is None or store_mtime >= csv_mtime):
+        df_store = store.read_table(f_store, "campagnes")
+        if df_store is not None:
+            return df_store, store.STORE_NAME
+    for name in ("campagnes.csv", "films.csv"):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            return pd.read_csv(path), name
+    return None, None
+
+def sorted_views(df_raw: pd.DataFrame, dates_cache: str | None = None) -> dict:
+    # vues de build_views triées par date : toute période est une tranche (periods.positions)
+    campagnes, films, detected, base_df = (
+        periods.sort_by_date(v) if isinstance(v, pd.DataFrame) else v for v in build_views(df_raw, dates_cache)
+    )
+    return {"campagnes": campagnes, "films": films, "detected": detected, "base_df": base_df}
+
+def columnar_views(df: pd.DataFrame) -> dict:
+    # la copie colonnaire est déjà la vue campagnes normalisée et triée
+    return {"campagnes": df, "films": None, "detected": "campagnes", "base_df": df}
+
+def load_dataset(data_dir: str, with_bridge: bool = False, with_cube: bool = False) -> dict | None:
+    """Vues prêtes à interroger, table pont et cube indexé si demandés ; None si aucune donnée.
+
+    Sans table pont (bridge None), les comptes réalisateurs redécoupent les noms : même résultat."""
+    signature = data_dir_signature(data_dir)
+    col_signature = file_signature(columnar.columnar_path(data_dir))
+    if is_fresh(col_signature, *signature):
+        views = columnar_views(columnar.read_columnar(col_signature[0]))
+        label, source_signature = columnar.COLUMNAR_NAME, col_signature
+    else:
+        df_raw, label = load_clean(data_dir)
+        if df_raw is None:
+            return None
+        views = sorted_views(df_raw, dates_cache_path(data_dir))
+        source_signature = file_signature(os.path.join(data_dir, label))
+
+    bridge = None
+    if with_bridge or with_cube:
+        bridge_signature = file_signature(directors.bridge_path(data_dir))
+        if is_fresh(bridge_signature, source_signature):
+            bridge = directors.read_bridge(bridge_signature[0])
+        if bridge is None:
+            bridge = directors.build_bridge(views["campagnes"])
+    dataset = {"views": views, "label": label, "signature": source_signature, "bridge": bridge, "cube": None}
+
+    if with_cube:
+        cube_signature = file_signature(cube.cube_path(data_dir))
+        cube_df = cube.read_cube(cube_signature[0]) if is_fresh(cube_signature, source_signature) else None
+        if cube_df is None:
+            work = {"campagnes": views["campagnes"],
+                    "films": views["films"] if views["films"] is not None else views["campagnes"]}
+            cube_df = cube.cube_from_views(work, bridge)
+        dataset["cube"] = cube.index_cube(cube_df)
+    return dataset
@@ -0,0 +1,259 @@
+import os
+import sqlite3
+import pandas as pd
+
+# Stockage optionnel : base SQLite locale avec index uniques, alimentée par upsert
+STORE_NAME = "packshot.sqlite"
+
+CAMPAGNE_KEYS = ["href"]
+FILM_KEYS = ["href", "Client", "Agence", "Production", "Réalisateur", "Date de sortie"]
+TABLE_KEYS = {"campagnes": CAMPAGNE_KEYS, "films": FILM_KEYS}
+
+def store_path(outdir: str) -> str:
+    return os.path.join(outdir, STORE_NAME)
+
+def _q(name: str) -> str:
+    # identifiants SQL (colonnes avec espaces / accents)
+    return '"' + name.replace('"', '""') + '"'
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({_q(table)})")]
+
+def ensure_table(conn: sqlite3.Connection, table: str, columns: list[str]) -> None:
+    keys = TABLE_KEYS[table]
+    existing = _table_columns(conn, table)
+    if not existing:
+        # clés NOT NULL DEFAULT '' : SQLite considère les NULL comme distincts dans un index unique
+        defs = [f"{_q(c)} TEXT NOT NULL DEFAULT ''" if c in keys else f"{_q(c)} TEXT" for c in columns]
+        conn.execute(f"CREATE TABLE {_q(table)} ({', '.join(defs)})")
+        conn.execute(
+            f"CREATE UNIQUE INDEX {_q('ux_' + table)} ON {_q(table)} ({', '.join(_q(c) for c in keys)})"
+        )
+        conn.execute(f"CREATE INDEX {_q('ix_' + table + '_date')} ON {_q(table)} ({_q('Date de sortie')})")
+        return
+    for c in columns:
+        if c not in existing:
+            conn.execute(f"ALTER TABLE {_q(table)} ADD COLUMN {_q(c)} TEXT")
+
+def ensure_table_for(conn: sqlite3.Connection, table: str, df: pd.DataFrame) -> None:
+    cols = list(df.columns) + [k for k in TABLE_KEYS[table] if k not in df.columns]
+    ensure_table(conn, table, cols)
+
+def _to_records(df: pd.DataFrame, table: str) -> tuple[list[str], list[tuple]]:
+    keys = TABLE_KEYS[table]
+    out = df.copy()
+    for c in keys:
+        if c not in out.columns:
+            out[c] = ""
+    if "Date de sortie" in out.columns and pd.api.types.is_datetime64_any_dtype(out["Date de sortie"]):
+        out["Date de sortie"] = out["Date de sortie"].dt.strftime("%Y-%m-%d")
+    cols = list(out.columns)
+    out = out[cols].astype(object).where(out[cols].notna(), None)
+    for c in keys:
+        out[c] = out[c].map(lambda v: "" if v is None else str(v))
+    records = [tuple(None if v is None else str(v) for v in row) for row in out.itertuples(index=False, name=None)]
+    return cols, records
+
+def upsert(conn: sqlite3.Connection, table: str, df: pd.DataFrame) -> int:
+    """Insère ou met à jour les lignes de df (la dernière occurrence gagne) ; renvoie le nombre de lignes
+    réellement insérées ou modifiées (une ligne identique à celle en base n'est pas réécrite)."""
+    if df.empty:
+        return 0
+    cols, records = _to_records(df, table)
+    keys = TABLE_KEYS[table]
+    ensure_table(conn, table, cols)
+    others = [c for c in cols if c not in keys]
+    if others:
+        action = ("DO UPDATE SET " + ", ".join(f"{_q(c)}=excluded.{_q(c)}" for c in others)
+                  + " WHERE " + " OR ".join(f"{_q(table)}.{_q(c)} IS NOT excluded.{_q(c)}" for c in others))
+    else:
+        action = "DO NOTHING"
+    sql = (
+        f"INSERT INTO {_q(table)} ({', '.join(_q(c) for c in cols)}) "
+        f"VALUES ({', '.join('?' for _ in cols)}) "
+        f"ON CONFLICT({', '.join(_q(c) for c in keys)}) {action}"
+    )
+    before = conn.total_changes
+    conn.executemany(sql, records)
+    return conn.total_changes - before
+
+def count_rows(conn: sqlite3.Connection, table: str) -> int:
+    if not _table_columns(conn, table):
+        return 0
+    return conn.execute(f"SELECT COUNT(*) FROM {_q(table)}").fetchone()[0]
+
+def import_csv(conn: sqlite3.Connection, table: str, csv_path: str) -> int:
+    # amorçage de la base depuis un historique CSV existant
+    df = pd.read_csv(csv_path)
+    if table == "campagnes":
+        df = df.drop_duplicates(subset=["href"], keep="last")
+    return upsert(conn, table, df)
+
+def read_table(path: str, table: str, columns: list[str] | None = None) -> pd.DataFrame | None:
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        existing = _table_columns(conn, table)
+        if not existing:
+            return None
+        cols = [c for c in (columns or existing) if c in existing]
+        order = f" ORDER BY {_q('Date de sortie')}" if "Date de sortie" in existing else ""
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(_q(c) for c in cols)} FROM {_q(table)}{order}", conn
+        )
+    finally:
+        conn.close()
+    # mêmes conventions que pd.read_csv : clés vides -> NaN
+    return df.mask(df.eq(""))
+
+def _keys_table(conn: sqlite3.Connection, table: str) -> str:
+    # table temporaire (vide) de clés, pour des jointures via l'index unique ; renvoie son nom SQL
+    tmp = _q(f"_keys_{table}")
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {tmp} (" + ", ".join(f"{_q(k)} TEXT" for k in TABLE_KEYS[table]) + ")")
+    conn.execute(f"DELETE FROM {tmp}")
+    return tmp
+
+def _load_keys(conn: sqlite3.Connection, table: str, df: pd.DataFrame) -> str:
+    # clés de df dans la table temporaire de clés
+    keys = TABLE_KEYS[table]
+    cols, records = _to_records(df, table)
+    pos = [cols.index(k) for k in keys]
+    tmp = _keys_table(conn, table)
+    conn.executemany(
+        f"INSERT INTO {tmp} VALUES ({', '.join('?' for _ in keys)})",
+        {tuple(r[i] for i in pos) for r in records},
+    )
+    return tmp
+
+def _key_join(table: str, a: str, b: str) -> str:
+    return " AND ".join(f"{a}.{_q(k)} = {b}.{_q(k)}" for k in TABLE_KEYS[table])
+
+# -------------------- Modifications d'un passage --------------------
+# Version d'origine des lignes touchées gardée dans des tables temporaires SQLite (hors mémoire Python) :
+# les deltas nets du passage (une ligne modifiée deux fois n'apparaît qu'une fois) sont relus en flux à la fin.
+def _tracking(conn: sqlite3.Connection, table: str) -> tuple[str, str]:
+    touched, before = _q(f"_touched_{table}"), _q(f"_before_{table}")
+    keys = TABLE_KEYS[table]
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {touched} (" + ", ".join(f"{_q(k)} TEXT" for k in keys)
+                 + f", UNIQUE ({', '.join(_q(k) for k in keys)}))")
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {before} AS SELECT * FROM main.{_q(table)} WHERE 0")
+    # colonnes ajoutées à la table depuis (ALTER TABLE ... ADD COLUMN, dans le même ordre)
+    existing = _table_columns(conn, f"_before_{table}")
+    for c in _table_columns(conn, table):
+        if c not in existing:
+            conn.execute(f"ALTER TABLE {before} ADD COLUMN {_q(c)} TEXT")
+    return touched, before
+
+def track_changes(conn: sqlite3.Connection, table: str, df: pd.DataFrame) -> None:
+    """À appeler avant upsert(df) : mémorise la version d'origine des lignes touchées pour la première fois."""
+    if df.empty or not _table_columns(conn, table):
+        return
+    _track_keys(conn, table, _load_keys(conn, table, df))
+
+def _track_keys(conn: sqlite3.Connection, table: str, tmp: str) -> None:
+    # clés de la table temporaire tmp : version d'origine des lignes, clés marquées comme touchées
+    touched, before = _tracking(conn, table)
+    conn.execute(
+        f"INSERT INTO {before} SELECT t.* FROM {_q(table)} t JOIN (SELECT DISTINCT * FROM {tmp}) k "
+        f"ON {_key_join(table, 't', 'k')} "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {touched} x WHERE {_key_join(table, 'x', 't')})"
+    )
+    conn.execute(f"INSERT OR IGNORE INTO {touched} SELECT * FROM {tmp}")
+    conn.execute(f"DELETE FROM {tmp}")
+
+def value_counts(conn: sqlite3.Connection, table: str, column: str) -> tuple[list[str], list[int]]:
+    """Valeurs distinctes non vides d'une colonne et leurs nombres de lignes."""
+    if column not in _table_columns(conn, table):
+        return [], []
+    rows = conn.execute(
+        f"SELECT {_q(column)}, COUNT(*) FROM {_q(table)} "
+        f"WHERE {_q(column)} IS NOT NULL AND {_q(column)} <> '' GROUP BY {_q(column)}"
+    ).fetchall()
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+def rename_values(conn: sqlite3.Connection, table: str, column: str, mapping: dict) -> int:
+    """Remplace des valeurs de column (ancienne -> nouvelle), modifications suivies comme un upsert.
+
+    Si la clé renommée existe déjà (colonne de la clé des films), la ligne renommée remplace l'autre."""
+    if not mapping or column not in _table_columns(conn, table):
+        return 0
+    ren = _q(f"_rename_{table}")
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {ren} (old TEXT PRIMARY KEY, new TEXT)")
+    conn.execute(f"DELETE FROM {ren}")
+    conn.executemany(f"INSERT INTO {ren} VALUES (?, ?)", mapping.items())
+    # clés avant et après renommage : toutes deux touchées (la seconde peut remplacer une ligne existante)
+    keys = TABLE_KEYS[table]
+    tmp = _keys_table(conn, table)
+    renamed = ", ".join("r.new" if k == column else f"t.{_q(k)}" for k in keys)
+    conn.execute(f"INSERT INTO {tmp} SELECT {', '.join(f't.{_q(k)}' for k in keys)} FROM {_q(table)} t "
+                 f"JOIN {ren} r ON t.{_q(column)} = r.old")
+    conn.execute(f"INSERT INTO {tmp} SELECT {renamed} FROM {_q(table)} t JOIN {ren} r ON t.{_q(column)} = r.old")
+    _track_keys(conn, table, tmp)
+    before = conn.total_changes
+    conn.execute(
+        f"UPDATE OR REPLACE {_q(table)} SET {_q(column)} = (SELECT r.new FROM {ren} r WHERE r.old = {_q(column)}) "
+        f"WHERE {_q(column)} IN (SELECT old FROM {ren})"
+    )
+    conn.execute(f"DELETE FROM {ren}")
+    return conn.total_changes - before
+
+# -------------------- Métadonnées --------------------
+META_TABLE = "_meta"
+CANONICAL_META = "alias_generation"  # génération du cache d'alias appliquée aux noms en base
+
+def get_meta(conn: sqlite3.Connection, key: str) -> str | None:
+    if not _table_columns(conn, META_TABLE):
+        return None
+    row = conn.execute(f"SELECT value FROM {_q(META_TABLE)} WHERE key = ?", (key,)).fetchone()
+    return None if row is None else row[0]
+
+def set_meta(conn: sqlite3.Connection, key: str, value: str | None) -> None:
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(META_TABLE)} (key TEXT PRIMARY KEY, value TEXT)")
+    if value is None:
+        conn.execute(f"DELETE FROM {_q(META_TABLE)} WHERE key = ?", (key,))
+    else:
+        conn.execute(f"INSERT OR REPLACE INTO {_q(META_TABLE)} VALUES (?, ?)", (key, value))
+
+def _text_columns(header: list[str], alias: str) -> str:
+    # NULL et "" confondus, comme dans les lignes texte des instantanés
+    return ", ".join(f"COALESCE({alias}.{_q(c)}, '')" for c in header)
+
+def changes(conn: sqlite3.Connection, table: str):
+    """(en-tête, lignes ajoutées, lignes retirées) depuis le premier track_changes ; lignes en itérateurs."""
+    header = _table_columns(conn, table)
+    if not header:
+        return header, iter(()), iter(())
+    touched, before = _tracking(conn, table)
+    current = (f"SELECT {_text_columns(header, 't')} FROM {_q(table)} t "
+               f"JOIN {touched} x ON {_key_join(table, 't', 'x')}")
+    prior = f"SELECT {_text_columns(header, 'b')} FROM {before} b"
+    return header, map(tuple, conn.execute(f"{current} EXCEPT {prior}")), map(tuple, conn.execute(f"{prior} EXCEPT {current}"))
+
+def prior_rows(conn: sqlite3.Connection, table: str):
+    """(en-tête, lignes) de la table avant le premier track_changes du passage ; lignes en itérateur."""
+    header = _table_columns(conn, table)
+    if not header:
+        return header, iter(())
+    touched, before = _tracking(conn, table)
+    untouched = (f"SELECT {_text_columns(header, 't')} FROM {_q(table)} t "
+                 f"WHERE NOT EXISTS (SELECT 1 FROM {touched} x WHERE {_key_join(table, 'x', 't')})")
+    return header, map(tuple, conn.execute(f"{untouched} UNION ALL SELECT {_text_columns(header, 'b')} FROM {before} b"))
+
+def replace_table(conn: sqlite3.Connection, table: str, header: list[str], rows) -> None:
+    # réécriture complète (restauration d'un instantané) : noms à recanoniser au passage suivant
+    set_meta(conn, CANONICAL_META, None)
+    conn.execute(f"DROP TABLE IF EXISTS {_q(table)}")
+    ensure_table(conn, table, header)
+    keys = set(TABLE_KEYS[table])
+    records = [tuple(v if (v != "" or c in keys) else None for c, v in zip(header, r)) for r in rows]
+    conn.executemany(
+        f"INSERT INTO {_q(table)} ({', '.join(_q(c) for c in header)}) VALUES ({', '.join('?' for _ in header)})",
+        records,
+    )
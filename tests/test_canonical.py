@@ -0,0 +1,75 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+import canonical
+import store
+import traitement
+
+@pytest.fixture(autouse=True)
+def fresh_aliases():
+    canonical._caches.clear()
+    yield
+    canonical._caches.clear()
+
+def names(values, dimension):
+    return list(canonical.canonicalize(pd.Series(values, dtype=object), dimension))
+
+@pytest.mark.parametrize("dimension", canonical.DIMENSIONS)
+@pytest.mark.parametrize("a, b", [
+    ("Jean Martin", "Jean Marin"),
+    ("Jean Martin", "Jean Martine"),
+    ("Publicis Conseil 1", "Publicis Conseil 2"),
+    ("Agence Martin & Co", "Agence Marin & Coo"),
+])
+def test_distinct_names_stay_apart(dimension, a, b):
+    assert names([a, a, b], dimension) == [a, a, b]
+
+@pytest.mark.parametrize("a, b", [
+    ("Olivier Dahan", "Olivier Dahin"),
+    ("Jean-Baptiste Mondino", "Jean-Baptiste Mondin"),
+])
+def test_directors_never_fuzzy_matched(a, b):
+    assert names([a, a, b], "Réalisateur") == [a, a, b]
+
+def test_typo_on_long_name_merged():
+    assert names(["Caisse d'Epargne", "Caisse d'Epargne", "Caisse d'Eparne"], "Client") == ["Caisse d'Epargne"] * 3
+
+def test_exact_variants_merged():
+    assert names(["TBWA\\", "TBWA\\", "TBWA"], "Agence") == ["TBWA"] * 3
+    assert names(["McDonald’s", "McDonald's", "McDonald's"], "Client") == ["McDonald's"] * 3
+
+@pytest.mark.parametrize("values", [
+    ["Sécurité routière", "Securite routiere"],
+    ["Securite routiere", "Sécurité routière"],
+    ["SECURITE ROUTIERE", "Sécurité routière", "securite routiere"],
+])
+def test_tie_keeps_diacritics(values):
+    assert set(names(values, "Client")) == {"Sécurité routière"}
+
+def test_most_frequent_form_wins():
+    assert names(["Securite routiere", "Securite routiere", "Sécurité routière"], "Client") == ["Securite routiere"] * 3
+
+def test_store_history_canonicalized(tmp_path):
+    # historique CSV antérieur à la canonisation, repris dans la base SQLite au premier passage
+    outdir = str(tmp_path)
+    films = pd.DataFrame({
+        "href": ["h1", "h2", "h3"],
+        "Date de sortie": ["2024-01-01", "2024-01-02", "2024-01-03"],
+        "Client": ["Securite routiere", "Sécurité routière", "Orange"],
+        "Agence": ["TBWA\\", "TBWA", "BETC"],
+        "Production": ["Wanda", "Wanda", "Quad"],
+        "Réalisateur": ["Jean Martin", "Jean Marin", "A"],
+    })
+    films.to_csv(tmp_path / "films.csv", index=False)
+    films.to_csv(tmp_path / "campagnes.csv", index=False)
+    new = pd.DataFrame({"href": ["h4"], "Date de sortie": pd.to_datetime(["2024-02-01"]), "Client": ["Orange"],
+                        "Agence": ["BETC"], "Production": ["Quad"], "Réalisateur": ["B"]})
+    with contextlib.redirect_stdout(io.StringIO()):
+        traitement.store_merge_chunks(iter([(new, new)]), outdir=outdir)
+    campagnes = store.read_table(store.store_path(outdir), "campagnes")
+    assert campagnes["Client"].value_counts()["Sécurité routière"] == 2
+    assert set(campagnes["Agence"]) == {"TBWA", "BETC"}
+    assert set(campagnes["Réalisateur"]) == {"Jean Martin", "Jean Marin", "A", "B"}
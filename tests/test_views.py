@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench import aggregate_campaigns_loop, synthetic_export
+from dates_fr import parse_dates_fr
+from views import aggregate_campaigns_from_films
+
+FILMS_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fichier-clean", "films.csv")
+
+def assert_same_campaigns(df_films: pd.DataFrame) -> None:
+    # version vectorisée = boucle d'origine (mêmes lignes, mêmes valeurs, même ordre des href)
+    expected = aggregate_campaigns_loop(df_films)
+    got = aggregate_campaigns_from_films(df_films)
+    pd.testing.assert_frame_equal(got[expected.columns].reset_index(drop=True), expected, check_dtype=False)
+
+def test_real_films_csv():
+    if not os.path.exists(FILMS_CSV):
+        pytest.skip("fichier-clean/films.csv absent")
+    df = pd.read_csv(FILMS_CSV)
+    df["Date de sortie"] = pd.to_datetime(df["Date de sortie"], errors="coerce", format="ISO8601")
+    assert_same_campaigns(df)
+
+def test_synthetic_export():
+    df = synthetic_export(5_000, seed=3).rename(columns={"Film-href": "href"})
+    df["Date de sortie"] = parse_dates_fr(df["Date de sortie"], cache_path=None)
+    assert_same_campaigns(df)
+
+def test_edge_cases():
+    df = pd.DataFrame({
+        "href": ["a", "a", "b", "b", np.nan, "c", "c", "d", "e", "e"],
+        "Date de sortie": pd.to_datetime(["2024-03-02", "2024-03-01", "2024-01-05", "2024-01-05", "2024-02-01",
+                                          "2024-04-01", "2024-04-02", "2024-05-01", "2024-06-01", "2024-06-01"]),
+        "Client": ["", "Renault", np.nan, "  ", "X", "Orange", "SFR", None, "Free", ""],
+        "Agence": ["TBWA", "BETC", "", "DDB", "X", np.nan, "Havas", "Publicis", "", ""],
+        "Production": ["Wanda", None, "Quad", "Quad", "X", "Iconoclast", "", "Wanda", "", np.nan],
+        "Réalisateur": ["B & A", "A", "", None, "X", "C, D", "D et E", "", np.nan, "F / G"],
+    })
+    assert_same_campaigns(df)
+
+def test_missing_columns():
+    df = pd.DataFrame({
+        "href": ["a", "a", "b"],
+        "Date de sortie": pd.to_datetime(["2024-01-02", "2024-01-01", "2024-02-01"]),
+        "Réalisateur": ["A", "B", "C"],
+    })
+    assert_same_campaigns(df)
+    assert_same_campaigns(df.drop(columns="Réalisateur"))
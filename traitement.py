@@ -1,34 +1,22 @@
 
 import os
-import sys
+import argparse
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-FRENCH_MONTHS = {
-    "janvier": "january",
-    "février": "february", "fevrier": "february",
-    "mars": "march",
-    "avril": "april",
-    "mai": "may",
-    "juin": "june",
-    "juillet": "july",
-    "août": "august", "aout": "august",
-    "septembre": "september",
-    "octobre": "october",
-    "novembre": "november",
-    "décembre": "december", "decembre": "december",
-}
-
-def normalize_dates_fr(series: pd.Series) -> pd.Series:
-    s = series.astype(str).str.strip().str.lower()
-    for fr, en in FRENCH_MONTHS.items():
-        s = s.str.replace(fr, en, regex=False)
-    s = s.str.replace(r"\s+", " ", regex=True)
-    return pd.to_datetime(s, errors="coerce", dayfirst=True, infer_datetime_format=True)
-
-def prepare_from_raw(path_xlsx: str) -> tuple[pd.DataFrame, pd.DataFrame]:
-    df = pd.read_excel(path_xlsx)
-    df.columns = [c.strip() for c in df.columns]
+import canonical
+import columnar
+import cube
+import directors
+import ingest
+import perf
+import store
+import snapshots
+from dates_fr import dates_cache_path, parse_dates_fr
+
+def normalize_raw(df: pd.DataFrame, dates_cache: str | None = None) -> pd.DataFrame:
+    df.columns = [str(c).strip() for c in df.columns]
 
     # Harmonise href
     if "href" not in df.columns and "Film-href" in df.columns:
@@ -39,17 +27,158 @@ def prepare_from_raw(path_xlsx: str) -> tuple[pd.DataFrame, pd.DataFrame]:
     # Dates
     if "Date de sortie" not in df.columns:
         raise ValueError("Colonne 'Date de sortie' introuvable.")
-    df["Date de sortie"] = normalize_dates_fr(df["Date de sortie"])
-    df = df.dropna(subset=["Date de sortie"]).copy()
+    with perf.stage("parse_dates", rows_in=len(df)) as rec:
+        df["Date de sortie"] = parse_dates_fr(df["Date de sortie"], dates_cache)
+        df = df.dropna(subset=["Date de sortie"])
+        rec["rows_out"] = len(df)
 
     # Trier par date croissante
-    df = df.sort_values("Date de sortie")
+    return df.sort_values("Date de sortie", kind="stable")
+
+def prepare_from_raw(path_xlsx: str, dates_cache: str | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    with perf.stage("read_excel") as rec:
+        raw = pd.read_excel(path_xlsx)
+        rec["rows_out"] = len(raw)
+    with perf.stage("normalize_raw", rows_in=len(raw)) as rec:
+        films_new = normalize_raw(raw, dates_cache)
+        rec["rows_out"] = len(films_new)
+    with perf.stage("campagnes_dedup", rows_in=len(films_new)) as rec:
+        campagnes_new = films_new.drop_duplicates(subset="href")
+        rec["rows_out"] = len(campagnes_new)
+    return campagnes_new, films_new
+
+RAW_EXTENSIONS = (".xlsx", ".xlsm")
+
+def expand_sources(sources) -> list[str]:
+    """Fichiers d'export à traiter : chemins donnés, et exports .xlsx des dossiers donnés (ordre alphabétique)."""
+    files = []
+    for src in sources:
+        if os.path.isdir(src):
+            names = sorted(f for f in os.listdir(src)
+                           if f.lower().endswith(RAW_EXTENSIONS) and not f.startswith(("~$", ".")))
+            files.extend(os.path.join(src, f) for f in names)
+        elif os.path.isfile(src):
+            files.append(src)
+        else:
+            raise ValueError(f"Fichier ou dossier introuvable : {src}")
+    if not files:
+        raise ValueError("Aucun export .xlsx trouvé dans les sources indiquées.")
+    return list(dict.fromkeys(files))
 
-    films_new = df.copy()
-    campagnes_new = df.drop_duplicates(subset="href").copy()
+def _prepare_films(path_xlsx: str, dates_cache: str | None = None) -> pd.DataFrame:
+    # tâche d'un processus du pool : seuls les films reviennent (les campagnes s'en déduisent)
+    return prepare_from_raw(path_xlsx, dates_cache)[1]
+
+def prepare_many(paths, jobs: int | None = None, dates_cache: str | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """prepare_from_raw sur plusieurs exports, lus et normalisés en parallèle (un processus par fichier).
+
+    Résultat identique à un export unique contenant les fichiers bout à bout : films triés par date
+    (ordre des fichiers à date égale), campagne = première diffusion sur l'ensemble du lot."""
+    paths = list(paths)
+    if len(paths) == 1:
+        return prepare_from_raw(paths[0], dates_cache)
+    with perf.stage("parse_files", rows_in=len(paths)) as rec:
+        with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(paths))) as pool:
+            parts = list(pool.map(_prepare_films, paths, [dates_cache] * len(paths)))
+        rec["rows_out"] = sum(len(p) for p in parts)
+    with perf.stage("batch_concat", rows_in=sum(len(p) for p in parts)) as rec:
+        films_new = pd.concat(parts, ignore_index=True).sort_values("Date de sortie", kind="stable")
+        campagnes_new = films_new.drop_duplicates(subset="href")
+        rec["rows_out"] = len(films_new)
     return campagnes_new, films_new
 
-def incremental_merge(campagnes_new: pd.DataFrame, films_new: pd.DataFrame, outdir: str = "fichier-clean"):
+def iter_raw_chunks(path_xlsx: str, chunksize: int = 50_000, dates_cache: str | None = None):
+    """Lit la feuille ligne à ligne (openpyxl en lecture seule) et produit des paquets films normalisés."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path_xlsx, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = ["" if c is None else str(c) for c in header]
+        width = len(columns)
+        buf = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            buf.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(buf) >= chunksize:
+                yield normalize_raw(pd.DataFrame(buf, columns=columns), dates_cache)
+                buf = []
+        if buf:
+            yield normalize_raw(pd.DataFrame(buf, columns=columns), dates_cache)
+    finally:
+        wb.close()
+
+def iter_prepared_chunks(path_xlsx, chunksize: int = 50_000, dates_cache: str | None = None):
+    """Équivalent par paquets de prepare_from_raw : (campagnes, films) pour chaque paquet.
+
+    path_xlsx : un export ou une liste d'exports lus à la suite.
+    Une campagne garde sa première diffusion sur tout le lot : si un paquet ultérieur contient
+    une date plus ancienne pour un href déjà vu, la ligne est réémise et remplace la précédente
+    (la dernière occurrence gagne lors de la fusion)."""
+    paths = [path_xlsx] if isinstance(path_xlsx, str) else list(path_xlsx)
+    seen = {}
+    for path in paths:
+        for films in iter_raw_chunks(path, chunksize, dates_cache):
+            campagnes = films.drop_duplicates(subset="href")
+            prev = pd.to_datetime(campagnes["href"].map(seen))
+            campagnes = campagnes[prev.isna() | (campagnes["Date de sortie"] < prev)]
+            seen.update(zip(campagnes["href"], campagnes["Date de sortie"]))
+            yield campagnes, films
+
+def stream_merge(path_xlsx, outdir: str = "fichier-clean", backend: str = "csv",
+                 chunksize: int = 50_000, keep_snapshots: int | None = None):
+    chunks = iter_prepared_chunks(path_xlsx, chunksize, dates_cache_path(outdir))
+    if backend == "sqlite":
+        # chaque paquet est upserté dès qu'il est lu : mémoire bornée par la taille du paquet
+        return store_merge_chunks(chunks, outdir=outdir, keep_snapshots=keep_snapshots)
+    # CSV : l'historique complet est réécrit de toute façon, on évite seulement les copies intermédiaires
+    campagnes_parts, films_parts = [], []
+    for campagnes, films in chunks:
+        campagnes_parts.append(campagnes)
+        films_parts.append(films)
+    if not films_parts:
+        raise ValueError("Aucune ligne exploitable dans le fichier.")
+    incremental_merge(pd.concat(campagnes_parts, ignore_index=True), pd.concat(films_parts, ignore_index=True),
+                      outdir=outdir, backend=backend, keep_snapshots=keep_snapshots)
+
+def _read_history(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    # Normaliser la date si besoin
+    if "Date de sortie" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["Date de sortie"]):
+        df["Date de sortie"] = pd.to_datetime(df["Date de sortie"], errors="coerce", format="ISO8601")
+    return df
+
+def _write_csv_atomic(df: pd.DataFrame, path: str) -> None:
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+def _write_derived(campagnes_all: pd.DataFrame, outdir: str) -> None:
+    # tables dérivées pour le dashboard, construites sur la table qu'il lit :
+    # vue campagnes colonnaire typée, pont href × Réalisateur puis cube pré-agrégé
+    # (écrits dans cet ordre : chacun est au moins aussi récent que la vue qu'il résume)
+    with perf.stage("work_views", rows_in=len(campagnes_all)) as rec:
+        work = cube.work_views(campagnes_all, dates_cache_path(outdir))
+        rec["rows_out"] = len(work["campagnes"])
+    with perf.stage("write_columnar", rows_in=len(work["campagnes"])):
+        columnar.write_columnar(work["campagnes"], outdir)
+    with perf.stage("director_bridge", rows_in=len(work["campagnes"])) as rec:
+        bridge = directors.build_bridge(work["campagnes"])
+        directors.write_bridge(bridge, outdir)
+        rec["rows_out"] = len(bridge)
+    with perf.stage("cube", rows_in=len(work["campagnes"])) as rec:
+        cube_df = cube.cube_from_views(work, bridge)
+        cube.write_cube(cube_df, outdir)
+        rec["rows_out"] = len(cube_df)
+
+def incremental_merge(campagnes_new: pd.DataFrame, films_new: pd.DataFrame, outdir: str = "fichier-clean",
+                      backend: str = "csv", keep_snapshots: int | None = None):
+    if backend == "sqlite":
+        return store_merge(campagnes_new, films_new, outdir=outdir, keep_snapshots=keep_snapshots)
     os.makedirs(outdir, exist_ok=True)
     ts = datetime.now().strftime("%Y-%m-%d_%Hh%M")
 
@@ -57,69 +186,211 @@ def incremental_merge(campagnes_new: pd.DataFrame, films_new: pd.DataFrame, outd
     f_films = os.path.join(outdir, "films.csv")
     f_campagnes = os.path.join(outdir, "campagnes.csv")
 
-    # Sauvegardes (roll-back possible)
-    if os.path.exists(f_films):
-        os.replace(f_films, os.path.join(outdir, f"films_backup_{ts}.csv"))
-    if os.path.exists(f_campagnes):
-        os.replace(f_campagnes, os.path.join(outdir, f"campagnes_backup_{ts}.csv"))
-
-    # Charger existants si présents
-    films_all = films_new.copy()
-    campagnes_all = campagnes_new.copy()
-
-    if os.path.exists(os.path.join(outdir, "films_backup_"+ts+".csv")):
-        # Recharger l'ancien pour merger
-        films_old = pd.read_csv(os.path.join(outdir, f"films_backup_{ts}.csv"))
-        # Normaliser la date si besoin
-        if "Date de sortie" in films_old.columns and not pd.api.types.is_datetime64_any_dtype(films_old["Date de sortie"]):
-            try:
-                films_old["Date de sortie"] = pd.to_datetime(films_old["Date de sortie"], errors="coerce", dayfirst=True, infer_datetime_format=True)
-            except Exception:
-                pass
-        films_all = pd.concat([films_old, films_new], ignore_index=True)
-
-    if os.path.exists(os.path.join(outdir, "campagnes_backup_"+ts+".csv")):
-        campagnes_old = pd.read_csv(os.path.join(outdir, f"campagnes_backup_{ts}.csv"))
-        campagnes_all = pd.concat([campagnes_old, campagnes_new], ignore_index=True)
-
-    # Déduplication robuste
-    # Campagnes : dédoublonner par href (garde la dernière occurrence)
-    if "href" not in campagnes_all.columns:
-        raise ValueError("La colonne 'href' est manquante après fusion des campagnes.")
-    campagnes_all = campagnes_all.drop_duplicates(subset=["href"], keep="last")
-
-    # Films : on utilise une clé composite robuste
-    film_keys = [c for c in ["href","Client","Agence","Production","Réalisateur","Date de sortie"] if c in films_all.columns]
-    if not film_keys:
-        # fallback ultra-conservateur : toutes colonnes
-        film_keys = list(films_all.columns)
-    films_all = films_all.drop_duplicates(subset=film_keys, keep="last")
-
-    # Tri par date
-    if "Date de sortie" in films_all.columns:
-        films_all = films_all.sort_values("Date de sortie")
-    if "Date de sortie" in campagnes_all.columns:
-        campagnes_all = campagnes_all.sort_values("Date de sortie")
-
-    # Écritures atomiques
-    films_all.to_csv(f_films, index=False)
-    campagnes_all.to_csv(f_campagnes, index=False)
-
-    # Exports datés pour archivage
-    films_all.to_csv(os.path.join(outdir, f"films_{ts}.csv"), index=False)
-    campagnes_all.to_csv(os.path.join(outdir, f"campagnes_{ts}.csv"), index=False)
+    with perf.stage("read_history", rows_in=len(films_new)) as rec:
+        # État précédent (lignes brutes) : sert au delta de l'instantané, sans copie de sauvegarde
+        previous = {"films": snapshots.read_previous(f_films), "campagnes": snapshots.read_previous(f_campagnes)}
+
+        # Charger existants si présents
+        films_all = films_new.copy()
+        campagnes_all = campagnes_new.copy()
+
+        if os.path.exists(f_films):
+            films_old = _read_history(f_films)
+            films_all = pd.concat([films_old, films_new], ignore_index=True)
+
+        if os.path.exists(f_campagnes):
+            campagnes_old = _read_history(f_campagnes)
+            campagnes_all = pd.concat([campagnes_old, campagnes_new], ignore_index=True)
+        rec["rows_out"] = len(films_all)
+
+    with perf.stage("canonical_names", rows_in=len(films_all) + len(campagnes_all)):
+        # Noms d'entités canoniques (historique compris) avant la clé composite des films
+        alias_cache = canonical.alias_cache_path(outdir)
+        films_all = canonical.canonicalize_names(films_all, alias_cache)
+        campagnes_all = canonical.canonicalize_names(campagnes_all, alias_cache)
+
+    with perf.stage("dedup", rows_in=len(films_all) + len(campagnes_all)) as rec:
+        # Déduplication robuste
+        # Campagnes : dédoublonner par href (garde la dernière occurrence)
+        if "href" not in campagnes_all.columns:
+            raise ValueError("La colonne 'href' est manquante après fusion des campagnes.")
+        campagnes_all = campagnes_all.drop_duplicates(subset=["href"], keep="last")
+
+        # Films : on utilise une clé composite robuste
+        film_keys = [c for c in ["href","Client","Agence","Production","Réalisateur","Date de sortie"] if c in films_all.columns]
+        if not film_keys:
+            # fallback ultra-conservateur : toutes colonnes
+            film_keys = list(films_all.columns)
+        films_all = films_all.drop_duplicates(subset=film_keys, keep="last")
+        rec["rows_out"] = len(films_all) + len(campagnes_all)
+
+    with perf.stage("canonical_sort", rows_in=len(films_all) + len(campagnes_all)):
+        # Tri par date (puis clé, pour un ordre reproductible par les instantanés)
+        films_all = snapshots.canonical_sort(films_all, "films")
+        campagnes_all = snapshots.canonical_sort(campagnes_all, "campagnes")
+
+    with perf.stage("write_csv", rows_in=len(films_all) + len(campagnes_all)):
+        # Écritures atomiques
+        _write_csv_atomic(films_all, f_films)
+        _write_csv_atomic(campagnes_all, f_campagnes)
+
+    with perf.stage("snapshot"):
+        # Instantané différentiel (remplace les sauvegardes et exports datés complets)
+        run_id = snapshots.record_csv_run(outdir, previous, ts)
+        if keep_snapshots is not None:
+            snapshots.compact(outdir, keep_snapshots, "csv")
+
+    # Cube pré-agrégé et table pont réalisateurs pour le dashboard
+    _write_derived(campagnes_all, outdir)
 
     # Log simple
     with open(os.path.join(outdir, "traitement.log"), "a", encoding="utf-8") as lg:
-        lg.write(f"[{ts}] films: {len(films_all)} lignes, campagnes: {len(campagnes_all)} lignes | clés films: {film_keys}\n")
+        lg.write(f"[{ts}] films: {len(films_all)} lignes, campagnes: {len(campagnes_all)} lignes | clés films: {film_keys} | instantané {run_id}\n")
+    perf.flush(os.path.join(outdir, "traitement.log"))
 
     print("✅ Fusion incrémentale terminée.")
     print(f"   → {f_films}")
     print(f"   → {f_campagnes}")
+    print(f"   → {cube.cube_path(outdir)}")
+    print(f"   → {directors.bridge_path(outdir)}")
+    print(f"   → {columnar.columnar_path(outdir)}")
+
+def store_merge(campagnes_new: pd.DataFrame, films_new: pd.DataFrame, outdir: str = "fichier-clean",
+                keep_snapshots: int | None = None):
+    return store_merge_chunks([(campagnes_new, films_new)], outdir=outdir, keep_snapshots=keep_snapshots)
+
+def canonicalize_store(conn, outdir: str) -> dict:
+    """Noms canoniques des lignes déjà en base (historique amorcé depuis les CSV compris), comme le fait
+    la fusion CSV sur tout l'historique ; une fois par génération du cache d'alias.
+    Renvoie {table: lignes modifiées} pour les tables modifiées."""
+    alias_cache = canonical.alias_cache_path(outdir)
+    generation = canonical.cache_generation(alias_cache)
+    if store.get_meta(conn, store.CANONICAL_META) == generation:
+        return {}
+    changed = {}
+    for table in ("films", "campagnes"):
+        for col in canonical.DIMENSIONS:
+            values, counts = store.value_counts(conn, table, col)
+            canon = canonical.canonical_names(values, counts, col, alias_cache)
+            n = store.rename_values(conn, table, col, {v: c for v, c in zip(values, canon) if v != c})
+            if n:
+                changed[table] = changed.get(table, 0) + n
+    store.set_meta(conn, store.CANONICAL_META, generation)
+    return changed
+
+def store_merge_chunks(chunks, outdir: str = "fichier-clean", keep_snapshots: int | None = None):
+    # Variante SQLite : upsert des seules lignes nouvelles/modifiées, sans réécrire l'historique
+    os.makedirs(outdir, exist_ok=True)
+    ts = datetime.now().strftime("%Y-%m-%d_%Hh%M")
+    f_store = store.store_path(outdir)
+    first_run = not os.path.exists(f_store)
+    manifest = snapshots.load_manifest(outdir, "sqlite")
+
+    conn = store.connect(f_store)
+    touched = {}
+    try:
+        with perf.stage("store_upsert") as rec:
+            with conn:
+                # Amorçage depuis les CSV existants lors du premier passage
+                if first_run:
+                    for table in ("films", "campagnes"):
+                        f_csv = os.path.join(outdir, f"{table}.csv")
+                        if os.path.exists(f_csv):
+                            store.import_csv(conn, table, f_csv)
+                with perf.stage("canonical_store") as rec_names:
+                    # lignes renommées suivies comme des upserts : elles figurent dans l'instantané
+                    touched.update(canonicalize_store(conn, outdir))
+                    rec_names["rows_out"] = sum(touched.values())
+                for campagnes_new, films_new in chunks:
+                    for table, df in (("films", films_new), ("campagnes", campagnes_new)):
+                        if df.empty:
+                            continue
+                        # noms canoniques avant l'upsert (la clé des films contient les noms)
+                        df = canonical.canonicalize_names(df, canonical.alias_cache_path(outdir))
+                        # version d'origine des lignes touchées mise de côté dans la base (tables temporaires)
+                        store.ensure_table_for(conn, table, df)
+                        store.track_changes(conn, table, df)
+                        touched[table] = touched.get(table, 0) + store.upsert(conn, table, df)
+            rec["rows_out"] = sum(touched.values())
+
+        with perf.stage("snapshot"):
+            # deltas nets du passage et état initial relus en flux depuis la base : mémoire bornée par le paquet
+            deltas = {}
+            for table in touched:
+                header, added, removed = store.changes(conn, table)
+                deltas[table] = {"header": header, "added": added, "removed": removed,
+                                 "rows": store.count_rows(conn, table)}
+            base = {table: store.prior_rows(conn, table) for table in ("films", "campagnes")
+                    if table not in manifest["base"]}
+            run_id = snapshots.record_run(outdir, "sqlite", ts, deltas, base=base)
+        n_films = store.count_rows(conn, "films")
+        n_campagnes = store.count_rows(conn, "campagnes")
+    finally:
+        conn.close()
+
+    # Cube pré-agrégé et table pont (seules les colonnes utiles sont relues depuis la base)
+    with perf.stage("read_store") as rec:
+        campagnes_all = store.read_table(f_store, "campagnes", columns=["href", "Date de sortie", *cube.DIMENSIONS])
+        rec["rows_out"] = None if campagnes_all is None else len(campagnes_all)
+    if campagnes_all is not None:
+        _write_derived(campagnes_all, outdir)
+    if keep_snapshots is not None:
+        with perf.stage("compact"):
+            snapshots.compact(outdir, keep_snapshots, "sqlite")
+
+    with open(os.path.join(outdir, "traitement.log"), "a", encoding="utf-8") as lg:
+        lg.write(f"[{ts}] sqlite | films: {n_films} lignes ({touched.get('films', 0)} upserts), campagnes: {n_campagnes} lignes ({touched.get('campagnes', 0)} upserts) | clés films: {store.FILM_KEYS} | instantané {run_id}\n")
+    perf.flush(os.path.join(outdir, "traitement.log"))
+
+    print("✅ Fusion incrémentale (SQLite) terminée.")
+    print(f"   → {f_store}")
+    print(f"   → {cube.cube_path(outdir)}")
+    print(f"   → {directors.bridge_path(outdir)}")
+    print(f"   → {columnar.columnar_path(outdir)}")
+
+def run(paths, outdir: str = "fichier-clean", backend: str = "csv", stream: bool = False,
+        chunksize: int = 50_000, jobs: int | None = None, keep_snapshots: int | None = None) -> int:
+    """Lit et fusionne les exports sous verrou exclusif de outdir, puis publie une nouvelle version."""
+    perf.begin("traitement")
+    try:
+        if stream:
+            # lecture et fusion entrelacées : tout le passage sous verrou
+            with ingest.locked(outdir):
+                stream_merge(paths, outdir=outdir, backend=backend, chunksize=chunksize, keep_snapshots=keep_snapshots)
+                return ingest.bump_version(outdir, paths)
+        # lecture des exports hors verrou : seule la fusion attend une éventuelle autre fusion
+        campagnes_new, films_new = prepare_many(paths, jobs=jobs, dates_cache=dates_cache_path(outdir))
+        with ingest.locked(outdir):
+            incremental_merge(campagnes_new, films_new, outdir=outdir, backend=backend, keep_snapshots=keep_snapshots)
+            return ingest.bump_version(outdir, paths)
+    finally:
+        perf.end()
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python3 traitement.py <chemin vers Packshot.xlsx>")
-        sys.exit(1)
-    campagnes_new, films_new = prepare_from_raw(sys.argv[1])
-    incremental_merge(campagnes_new, films_new, outdir="fichier-clean")
+    parser = argparse.ArgumentParser(description="Nettoyage et fusion incrémentale d'un export Packshot.")
+    parser.add_argument("sources", nargs="+", metavar="source",
+                        help="chemin vers Packshot.xlsx ; plusieurs exports ou dossiers d'exports acceptés "
+                             "(fusionnés en une seule fois, un seul instantané)")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv",
+                        help="stockage de l'historique : CSV réécrits (défaut) ou base SQLite indexée")
+    parser.add_argument("--keep-snapshots", type=int, default=None, metavar="N",
+                        help="rétention : ne conserver que les N derniers instantanés (défaut : tous)")
+    parser.add_argument("--stream", action="store_true",
+                        help="lecture ligne à ligne par paquets (mémoire bornée, recommandé avec --backend sqlite)")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="taille des paquets en mode --stream")
+    parser.add_argument("--jobs", type=int, default=None, metavar="N",
+                        help="processus de lecture en parallèle pour plusieurs exports (défaut : nombre de cœurs)")
+    parser.add_argument("--perf", action="store_true",
+                        help=f"mesures par étape (temps, lignes) en JSON dans traitement.log "
+                             f"(équivalent à {perf.ENV_VAR}=1)")
+    parser.add_argument("--perf-memory", action="store_true",
+                        help=f"--perf avec le pic mémoire par étape (tracemalloc, plus lent ; "
+                             f"équivalent à {perf.MEMORY_ENV_VAR}=1)")
+    args = parser.parse_args()
+    if args.perf or args.perf_memory:
+        perf.enable(memory=args.perf_memory or perf.tracks_memory())
+    paths = expand_sources(args.sources)
+    if len(paths) > 1:
+        print(f"📥 {len(paths)} exports à fusionner en un seul passage.")
+    run(paths, outdir="fichier-clean", backend=args.backend, stream=args.stream, chunksize=args.chunksize,
+        jobs=args.jobs, keep_snapshots=args.keep_snapshots)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Tendances : matrice dense valeurs × mois (mois consécutifs, mois vides compris) par dimension,
+# tirée du cube indexé (cube.index_cube). Fenêtres glissantes, croissances et classements
+# « plus fortes progressions » calculés pour toutes les valeurs à la fois, sans relire les lignes.
+#   m = month_matrix(cube_idx, "Agence", "campagnes")
+#   rising(m, window=6, end="2025-06-30", n=10)
+RANK_BY = ["Δ", "Croissance (%)"]
+
+def month_matrix(cube_idx: dict, dimension: str, granularite: str) -> dict | None:
+    """{"months", "values", "counts" (valeurs × mois), "cum" (sommes cumulées, un mois de plus)} ; None si absent."""
+    entry = cube_idx.get((dimension, granularite))
+    if entry is None or not len(entry["months"]):
+        return None
+    months = pd.date_range(entry["months"][0], entry["months"][-1], freq="MS")
+    counts = np.zeros((len(entry["values"]), len(months)), dtype=np.int32)
+    counts[:, months.get_indexer(entry["months"])] = np.diff(entry["cum"], axis=1)
+    cum = np.zeros((counts.shape[0], counts.shape[1] + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=cum[:, 1:])
+    return {"months": months, "values": entry["values"], "counts": counts, "cum": cum}
+
+def month_position(matrix: dict, when=None) -> int:
+    """Nombre de mois de la matrice jusqu'au mois de `when` inclus (dernier mois si None)."""
+    months = matrix["months"]
+    if when is None:
+        return len(months)
+    when = pd.Timestamp(when).to_period("M").to_timestamp()
+    return int(months.searchsorted(when, side="right"))
+
+def rolling(matrix: dict, window: int) -> np.ndarray:
+    """Somme glissante sur `window` mois (valeurs × mois) ; les premiers mois sommés sur ce qui précède."""
+    cum = matrix["cum"]
+    k = np.arange(1, cum.shape[1])
+    return cum[:, k] - cum[:, np.maximum(k - window, 0)]
+
+def window_sums(matrix: dict, window: int, end=None) -> tuple[np.ndarray, np.ndarray, pd.DatetimeIndex, pd.DatetimeIndex]:
+    """(récent, précédent, mois récents, mois précédents) : deux fenêtres consécutives de `window` mois
+    se terminant au mois de `end`."""
+    cum, months = matrix["cum"], matrix["months"]
+    k = month_position(matrix, end)
+    k1, k0 = max(k - window, 0), max(k - 2 * window, 0)
+    return cum[:, k] - cum[:, k1], cum[:, k1] - cum[:, k0], months[k1:k], months[k0:k1]
+
+def growth(matrix: dict, window: int, end=None) -> pd.DataFrame:
+    """Toutes les valeurs : comptes des deux fenêtres, écart et taux de croissance (NaN si précédent nul)."""
+    recent, previous, _, _ = window_sums(matrix, window, end)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(previous > 0, (recent - previous) / previous * 100, np.nan)
+    return pd.DataFrame({
+        "Nom": matrix["values"],
+        "Période précédente": previous,
+        "Période récente": recent,
+        "Δ": recent - previous,
+        "Croissance (%)": np.round(rate, 1),
+    })
+
+def rising(matrix: dict, window: int, end=None, n: int = 10, by: str = "Δ", min_count: int = 1) -> pd.DataFrame:
+    """Plus fortes progressions (Δ > 0) entre les deux fenêtres ; min_count : comptes récents minimum.
+
+    by="Croissance (%)" classe sur le taux (valeurs absentes de la fenêtre précédente en tête)."""
+    if by not in RANK_BY:
+        raise ValueError(f"Classement inconnu : {by} (attendu : {', '.join(RANK_BY)})")
+    g = growth(matrix, window, end)
+    g = g[(g["Δ"] > 0) & (g["Période récente"] >= min_count)]
+    if by == "Croissance (%)":
+        # nouvelles valeurs (taux infini) d'abord, puis taux, puis écart
+        order = ["Nouveau", "Croissance (%)", "Δ", "Nom"]
+        g = g.assign(Nouveau=g["Période précédente"] == 0)
+        g = g.sort_values(order, ascending=[False, False, False, True], kind="stable").drop(columns="Nouveau")
+    else:
+        g = g.sort_values(["Δ", "Période récente", "Nom"], ascending=[False, False, True], kind="stable")
+    g = g.head(n).reset_index(drop=True)
+    g.insert(0, "Rang", range(1, len(g) + 1))
+    return g
+
+def rolling_frame(matrix: dict, window: int, names, start=None, end=None) -> pd.DataFrame:
+    """Séries glissantes (Mois, Nom, Nombre) de quelques valeurs, pour un graphique."""
+    pos = pd.Index(matrix["values"]).get_indexer(list(names))
+    pos = pos[pos >= 0]
+    sums = rolling(matrix, window)[pos]
+    months = matrix["months"]
+    i = 0 if start is None else max(month_position(matrix, start) - 1, 0)
+    j = month_position(matrix, end)
+    return pd.DataFrame({
+        "Mois": np.tile(months[i:j], len(pos)),
+        "Nom": np.repeat(matrix["values"][pos], j - i),
+        "Nombre": sums[:, i:j].ravel(),
+    })
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+import perf
+from dates_fr import parse_dates_fr
+from directors import campaign_directors, explode_directors
+from ranking import top_from_counts
+
+# Préparation des vues (sans Streamlit) : partagée par le dashboard et par traitement.py
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = [c.strip() for c in df.columns]
+    if "href" not in df.columns and "Film-href" in df.columns:
+        df = df.rename(columns={"Film-href": "href"})
+    return df
+
+def ensure_date(df: pd.DataFrame, dates_cache: str | None = None) -> pd.DataFrame:
+    if "Date de sortie" not in df.columns:
+        raise ValueError("Colonne 'Date de sortie' manquante.")
+    out = parse_dates_fr(df["Date de sortie"], dates_cache)
+    df = df.copy()
+    df["Date de sortie"] = out
+    df = df.dropna(subset=["Date de sortie"])
+    return df
+
+def normalize_text_cols(df: pd.DataFrame, cols):
+    out = df.copy()
+    for c in cols:
+        if c in out.columns:
+            out[c] = out[c].astype(str).str.strip()
+            out[c] = out[c].replace({"": "Inconnu", "nan": "Inconnu", "None": "Inconnu"})
+    return out
+
+def _non_blank(s: pd.Series) -> np.ndarray:
+    # ni NaN ni chaîne vide (test fait une fois par valeur distincte)
+    codes, uniques = pd.factorize(s)
+    ok = pd.Series(np.asarray(uniques, dtype=object).astype(str)).str.strip().ne("").to_numpy()
+    return (codes >= 0) & np.append(ok, False)[codes]
+
+def aggregate_campaigns_from_films(df_films: pd.DataFrame) -> pd.DataFrame:
+    # construit une vue Campagnes à partir d’un tableau films (vectorisé : ni apply ni lambda)
+    df = df_films.sort_values("Date de sortie", kind="stable")
+    # href factorisé une seule fois (codes triés) : tous les regroupements se font sur des entiers
+    hcodes, hrefs = pd.factorize(df["href"], sort=True)
+    tmp = pd.DataFrame({"_h": hcodes, "Date de sortie": df["Date de sortie"].to_numpy()})
+    for col in ["Client","Agence","Production"]:
+        if col in df.columns:
+            # on masque les vides : groupby.first saute les NaN
+            tmp[col] = df[col].where(_non_blank(df[col])).to_numpy()
+        else:
+            tmp[col] = "Inconnu"
+    agg = tmp[hcodes >= 0].groupby("_h").agg({
+        "Date de sortie": "min",  # première diffusion de la campagne
+        "Client": "first",
+        "Agence": "first",
+        "Production": "first",
+    })
+    agg[["Client","Agence","Production"]] = agg[["Client","Agence","Production"]].fillna("Inconnu")
+
+    # union triée des réalisateurs par href, concaténée pour affichage lisible
+    reals = df["Réalisateur"] if "Réalisateur" in df.columns else pd.Series("Inconnu", index=df.index)
+    reals = explode_directors(reals.set_axis(np.arange(len(df))))
+    rcodes, names = pd.factorize(reals, sort=True)
+    h = hcodes[reals.index.to_numpy()]
+    pair_keys = np.sort(h[h >= 0].astype(np.int64) * len(names) + rcodes[h >= 0])  # tri (href, réalisateur)
+    pair_keys = pair_keys[np.r_[True, pair_keys[1:] != pair_keys[:-1]]] if len(pair_keys) else pair_keys
+    pair_h, pair_r = np.divmod(pair_keys, len(names)) if len(names) else (pair_keys, pair_keys)
+    labels = pd.Series(np.asarray(names, dtype=object)[pair_r] + " & ", dtype=object)
+    joined = labels.groupby(pair_h).sum().str[:-3]
+    agg["Réalisateur"] = joined.reindex(agg.index).fillna("Inconnu")
+
+    agg.index = pd.Index(np.asarray(hrefs)[agg.index], name="href")
+    return agg.reset_index()
+
+def detect_granularity(df: pd.DataFrame) -> str:
+    # si href unique => dataset campagnes, sinon films
+    if "href" in df.columns and df["href"].nunique(dropna=True) == len(df):
+        return "campagnes"
+    return "films"
+
+def build_views(df_raw: pd.DataFrame, dates_cache: str | None = None):
+    # normaliser colonnes + date + textes
+    base_df = normalize_columns(df_raw)
+    needed = ["href","Client","Agence","Production","Réalisateur","Date de sortie"]
+    for col in needed:
+        if col not in base_df.columns:
+            if col == "href":
+                raise ValueError("Colonne clé 'href' (ou 'Film-href') manquante.")
+            base_df[col] = "Inconnu"
+    with perf.stage("ensure_date", rows_in=len(base_df)) as rec:
+        base_df = ensure_date(base_df, dates_cache)
+        rec["rows_out"] = len(base_df)
+    with perf.stage("normalize_text_cols", rows_in=len(base_df)):
+        base_df = normalize_text_cols(base_df, ["Client","Agence","Production","Réalisateur"])
+
+    detected = detect_granularity(base_df)
+    if detected == "campagnes":
+        campagnes = base_df.copy()
+        films = None
+    else:
+        films = base_df.copy()
+        with perf.stage("aggregate_campaigns_from_films", rows_in=len(base_df)) as rec:
+            campagnes = aggregate_campaigns_from_films(base_df)
+            rec["rows_out"] = len(campagnes)
+
+    return campagnes, films, detected, base_df
+
+def top_df(df: pd.DataFrame, label_col: str, n: int) -> pd.DataFrame:
+    return top_from_counts(df[label_col].value_counts(), label_col, n)
+
+def top_director_by_campaigns(campagnes_df: pd.DataFrame, n: int, bridge: pd.DataFrame | None = None) -> pd.DataFrame:
+    # 1 campagne par réalisateur (réalisateurs multiples : table pont href × Réalisateur si fournie)
+    return top_from_counts(campaign_directors(campagnes_df, bridge).value_counts(), "Réalisateur", n)